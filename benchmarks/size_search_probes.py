@@ -0,0 +1,103 @@
+"""
+Compara el número de codificaciones de la búsqueda del tamaño objetivo con y sin el
+modelo predictivo sobre un corpus mixto, y el número de rondas (latencia en
+codificaciones) de la búsqueda paralela especulativa.
+
+Uso: python benchmarks/size_search_probes.py [carpeta_con_imagenes]
+
+Sin carpeta se genera un corpus sintético (ruido, degradados, ilustraciones y fractales).
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw
+from functionalities.imaging import encode_to_bytes
+from functionalities.size_search import SizeSearch, build_size_model
+
+# Fracciones del tamaño a calidad máxima usadas como peso objetivo
+TARGET_FRACTIONS = (0.6, 0.3, 0.12, 0.04, 0.01)
+MAX_ATTEMPTS = 20
+# Candidatos por ronda en la búsqueda paralela
+PARALLELISM = 8
+
+
+def synthetic_corpus():
+    """Genera imágenes de distinta complejidad."""
+    size = (1600, 1200)
+    noise = Image.effect_noise(size, 40).convert('RGB')
+    yield 'ruido', noise
+
+    gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+    yield 'degradado', gradient
+
+    drawing = Image.new('RGB', size, (245, 245, 240))
+    draw = ImageDraw.Draw(drawing)
+    for i in range(0, size[0], 40):
+        draw.line((i, 0, size[0] - i, size[1]), fill=(i % 255, 80, 160), width=3)
+        draw.ellipse((i, i % size[1], i + 120, (i % size[1]) + 90), outline=(20, 20, 20), width=2)
+    yield 'ilustración', drawing
+
+    mandelbrot = Image.effect_mandelbrot(size, (-2.0, -1.2, 0.8, 1.2), 100).convert('RGB')
+    yield 'fractal', mandelbrot
+
+    mixed = Image.blend(noise, mandelbrot, 0.6)
+    yield 'mixta', mixed
+
+def folder_corpus(folder_path):
+    """Carga las imágenes JPEG y PNG de una carpeta."""
+    for filename in sorted(os.listdir(folder_path)):
+        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+            with Image.open(os.path.join(folder_path, filename)) as img:
+                yield filename, img.convert('RGB')
+
+def run_search(img, max_kb, use_model, executor=None):
+    """Ejecuta una búsqueda y devuelve (codificaciones, rondas, dentro_de_ventana, segundos)."""
+    def probe(quality, resize_factor):
+        return len(encode_to_bytes(img, 'JPEG', resize_factor, quality=quality, optimize=True)) / 1024
+
+    start = time.perf_counter()
+    model = None
+    if use_model:
+        model = build_size_model(img, lambda proxy, quality: encode_to_bytes(proxy, 'JPEG', quality=quality, optimize=True))
+    search = SizeSearch(probe, max_kb, MAX_ATTEMPTS, model, executor, PARALLELISM)
+    best = search.run()
+    elapsed = time.perf_counter() - start
+    in_window = best is not None and best[2] >= max_kb * 0.8
+    return search.attempts, search.rounds, in_window, elapsed
+
+def main():
+    corpus = folder_corpus(sys.argv[1]) if len(sys.argv) > 1 else synthetic_corpus()
+    modes = (('sin modelo', False, False), ('con modelo', True, False), ('paralelo', True, True))
+    totals = {label: [0, 0, 0, 0.0] for label, _, _ in modes}
+    runs = 0
+
+    with ThreadPoolExecutor(max_workers=PARALLELISM) as executor:
+        print(f"{'imagen':<14}{'objetivo KB':>12}" + ''.join(f"{label:>12}" for label, _, _ in modes))
+        for name, img in corpus:
+            full_kb = len(encode_to_bytes(img, 'JPEG', quality=100, optimize=True)) / 1024
+            for fraction in TARGET_FRACTIONS:
+                max_kb = full_kb * fraction
+                row = []
+                for label, use_model, parallel in modes:
+                    attempts, rounds, in_window, elapsed = run_search(img, max_kb, use_model, executor if parallel else None)
+                    total = totals[label]
+                    total[0] += attempts
+                    total[1] += rounds
+                    total[2] += in_window
+                    total[3] += elapsed
+                    row.append(f"{attempts}/{rounds}{'' if in_window else '*'}")
+                runs += 1
+                print(f"{name:<14}{max_kb:>12.1f}" + ''.join(f"{cell:>12}" for cell in row))
+
+    print("\nCeldas: codificaciones/rondas. * = no alcanzó la ventana [0.8×, 1.0×] del objetivo")
+    for label, _, _ in modes:
+        attempts, rounds, hits, elapsed = totals[label]
+        print(f"{label}: {attempts / runs:.2f} codificaciones y {rounds / runs:.2f} rondas de media, "
+              f"{hits}/{runs} en ventana, {elapsed:.2f} s en total")
+
+if __name__ == "__main__":
+    main()
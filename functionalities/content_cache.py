@@ -0,0 +1,151 @@
+import os
+import shutil
+import hashlib
+import threading
+
+# Tamaño de bloque para calcular el hash de los archivos de origen
+HASH_CHUNK_SIZE = 1024 * 1024
+# Salidas guardadas entre dos purgas de la caché
+EVICT_INTERVAL = 256
+
+
+def hash_bytes(data):
+    """
+    Calcula el hash del contenido de una imagen en memoria.
+
+    :param data: Bytes del archivo de origen.
+    :return: Hash SHA-256 en hexadecimal.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path):
+    """
+    Calcula el hash del contenido de un archivo leyéndolo por bloques.
+
+    :param path: Ruta del archivo.
+    :return: Hash SHA-256 en hexadecimal.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _link_or_copy(source, destination):
+    """
+    Crea un enlace duro de `source` en `destination` o, si no es posible, lo copia.
+
+    :param source: Archivo existente.
+    :param destination: Ruta de destino (se reemplaza si existe).
+    """
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class ContentCache:
+    """
+    Caché direccionada por contenido: hash de los bytes de entrada + parámetros -> salida codificada.
+
+    Las entradas se guardan repartidas en subcarpetas por prefijo del hash. La fecha de
+    modificación de cada entrada se actualiza al reutilizarla, de modo que `evict` puede
+    eliminar las menos usadas recientemente hasta respetar el tamaño máximo; `note_stores`
+    la llama cada EVICT_INTERVAL salidas para que la caché no crezca sin límite durante
+    ejecuciones largas. El objeto solo guarda rutas, por lo que se puede enviar a procesos
+    trabajadores.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._stores_since_evict = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, content_hash, params_key, extension):
+        """
+        Construye la clave de una entrada de la caché.
+
+        :param content_hash: Hash de los bytes de entrada.
+        :param params_key: Hash de los parámetros de compresión.
+        :param extension: Extensión del archivo de salida.
+        :return: Clave de la entrada.
+        """
+        digest = hashlib.sha256(f"{content_hash}:{params_key}".encode('utf-8')).hexdigest()
+        return digest + extension.lower()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, output_path):
+        """
+        Satisface una salida a partir de la caché, si existe la entrada.
+
+        :param key: Clave de la entrada.
+        :param output_path: Ruta donde colocar la salida.
+        :return: Booleano que indica si hubo acierto.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            os.utime(entry_path)
+            _link_or_copy(entry_path, output_path)
+            return True
+        except OSError:
+            return False
+
+    def store(self, key, output_path):
+        """
+        Guarda en la caché una salida recién codificada.
+
+        :param key: Clave de la entrada.
+        :param output_path: Archivo generado a guardar.
+        """
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(output_path, temp_path)
+        os.replace(temp_path, entry_path)
+
+    def note_stores(self, count=1):
+        """
+        Cuenta salidas guardadas (por este objeto o por sus copias en los trabajadores) y purga la caché cada EVICT_INTERVAL.
+
+        :param count: Número de salidas guardadas desde la última llamada.
+        :return: Número de entradas eliminadas (0 si aún no tocaba purgar).
+        """
+        self._stores_since_evict += count
+        if self._stores_since_evict < EVICT_INTERVAL:
+            return 0
+        self._stores_since_evict = 0
+        return self.evict()
+
+    def evict(self):
+        """
+        Elimina las entradas menos usadas recientemente hasta que la caché no supere `max_bytes`.
+
+        :return: Número de entradas eliminadas.
+        """
+        entries = []
+        total = 0
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -0,0 +1,83 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def image_bytes(img):
+    """
+    Calcula la memoria aproximada que ocupan los píxeles de una imagen decodificada.
+
+    :param img: Imagen de PIL.
+    :return: Ancho × alto × bandas en bytes.
+    """
+    return img.width * img.height * len(img.getbands())
+
+
+class DecodedImageCache:
+    """
+    Caché LRU en memoria de imágenes decodificadas y de sus derivadas (miniaturas, copias reducidas).
+
+    Las entradas se identifican por la ruta del archivo, su fecha de modificación y su tamaño,
+    de modo que un archivo modificado en disco nunca devuelve píxeles antiguos, más una
+    variante que distingue las derivadas de un mismo archivo. Cuando la memoria ocupada
+    supera `max_bytes` se descartan las entradas menos usadas recientemente. Se puede usar
+    desde varios hilos; las imágenes devueltas se comparten y no deben modificarse. Si varios
+    hilos piden a la vez una entrada que falta, solo el primero la carga y el resto la espera.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._loading = {}  # Clave -> Event de las entradas que otro hilo está cargando
+        self._lock = threading.Lock()
+
+    def get(self, path, variant, loader):
+        """
+        Devuelve la entrada de `path` para la variante indicada, cargándola con `loader` si falta.
+
+        :param path: Ruta del archivo de origen.
+        :param variant: Clave que distingue las derivadas del archivo (por ejemplo ('source', False)).
+        :param loader: Función sin argumentos que devuelve la imagen o una tupla cuyo primer elemento es la imagen.
+        :return: Lo devuelto por `loader`.
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, variant)
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Otro hilo ya la está cargando: se espera y se vuelve a consultar (si falló o no
+            # cabía en la caché, la carga el siguiente)
+            loading.wait()
+
+        # La decodificación se hace fuera del cerrojo para no bloquear al resto de hilos
+        try:
+            value = loader()
+            img = value[0] if isinstance(value, tuple) else value
+            cost = image_bytes(img)
+            if cost > self.max_bytes:
+                return value
+
+            with self._lock:
+                self._entries[key] = (value, cost)
+                self.total_bytes += cost
+                while self.total_bytes > self.max_bytes:
+                    _, (_, evicted_cost) = self._entries.popitem(last=False)
+                    self.total_bytes -= evicted_cost
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def clear(self):
+        """Vacía la caché."""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
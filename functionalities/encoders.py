@@ -0,0 +1,189 @@
+import os
+from PIL import Image
+
+# Esfuerzo del codificador WebP (opción `method`): 0 es el más rápido y 6 el que genera archivos más pequeños
+WEBP_METHODS = range(0, 7)
+DEFAULT_WEBP_METHOD = 4
+# Colores de la paleta del formato PNG8
+PALETTE_COLORS = 256
+
+
+class Encoder:
+    """
+    Codificador de un formato de salida: extensiones, ajustes propios y cómo codificar con ellos.
+
+    Los ajustes (por ejemplo el esfuerzo de WebP) llegan en un diccionario compartido por todos
+    los formatos, como los parámetros de compresión del motor por lotes o la configuración de la
+    interfaz gráfica; cada codificador toma solo las claves de `defaults` y usa sus valores por
+    defecto para las que falten. Por defecto se codifica con Image.save de PIL, pero `save`
+    permite usar otra biblioteca o backend para el mismo formato.
+    """
+
+    def __init__(self, name, extensions, options, defaults=None, lossy=None, convert=None, save=None):
+        """
+        :param name: Nombre del formato (el de PIL si se codifica con Image.save, por ejemplo 'JPEG').
+        :param extensions: Extensiones que se leen como este formato; la primera es la de los archivos de salida.
+        :param options: Función (calidad, ajustes) que devuelve las opciones de codificación.
+        :param defaults: Ajustes propios del formato y sus valores por defecto.
+        :param lossy: Función (ajustes) que indica si la calidad afecta al tamaño; None si siempre lo hace.
+        :param convert: Función que adapta el modo de una imagen al formato; None si lo admite todo.
+        :param save: Función (imagen, archivo, opciones) que codifica; None para usar Image.save.
+        """
+        self.name = name
+        self.extensions = tuple(extensions)
+        self.extension = self.extensions[0]
+        self.defaults = dict(defaults or {})
+        self._options = options
+        self._lossy = lossy
+        self._convert = convert
+        self._save = save
+
+    def settings(self, settings=None):
+        """
+        Combina los ajustes indicados con los valores por defecto del formato.
+
+        :param settings: Diccionario de ajustes de cualquier formato (o None).
+        :return: Diccionario con solo los ajustes de este formato.
+        """
+        merged = dict(self.defaults)
+        if settings:
+            merged.update((key, settings[key]) for key in self.defaults if key in settings)
+        return merged
+
+    def has_quality(self, settings=None):
+        """
+        Indica si la calidad con pérdida afecta al tamaño, de modo que la búsqueda del peso objetivo pueda ajustarla.
+
+        :param settings: Ajustes del formato.
+        :return: Booleano.
+        """
+        return self._lossy is None or self._lossy(self.settings(settings))
+
+    def options(self, quality, settings=None):
+        """
+        Opciones de codificación para una calidad y unos ajustes.
+
+        :param quality: Calidad (1-100) de los formatos con pérdida.
+        :param settings: Ajustes del formato.
+        :return: Diccionario de opciones para `save`.
+        """
+        return self._options(quality, self.settings(settings))
+
+    def convert(self, img):
+        """
+        Adapta el modo de una imagen a los que admite el formato.
+
+        :param img: Imagen de PIL.
+        :return: Imagen convertida (o la misma si no hace falta).
+        """
+        return self._convert(img) if self._convert is not None else img
+
+    def save(self, img, output, options):
+        """
+        Codifica una imagen ya convertida y redimensionada.
+
+        :param img: Imagen de PIL.
+        :param output: Ruta o archivo en memoria.
+        :param options: Opciones devueltas por `options`.
+        """
+        if self._save is not None:
+            self._save(img, output, options)
+        else:
+            img.save(output, self.name, **options)
+
+
+# Registro de codificadores: nombre del formato -> Encoder
+ENCODERS = {}
+
+def register_encoder(encoder):
+    """
+    Registra (o reemplaza) el codificador de un formato.
+
+    El motor por lotes, la interfaz gráfica y la búsqueda del peso objetivo consultan este
+    registro, por lo que un formato registrado queda disponible en todos ellos. Con el backend
+    de procesos, el registro debe hacerse al importar un módulo para que también exista en los
+    trabajadores.
+
+    :param encoder: Instancia de Encoder.
+    :return: El mismo codificador.
+    """
+    ENCODERS[encoder.name] = encoder
+    return encoder
+
+def get_encoder(name):
+    """
+    Devuelve el codificador registrado de un formato.
+
+    :param name: Nombre del formato.
+    :return: Instancia de Encoder, o None si el formato no está registrado.
+    """
+    return ENCODERS.get(name)
+
+def encoder_for_path(path):
+    """
+    Devuelve el codificador que corresponde a la extensión de una ruta.
+
+    :param path: Ruta o nombre de archivo.
+    :return: Instancia de Encoder, o None si la extensión no pertenece a ningún formato registrado.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for encoder in ENCODERS.values():
+        if extension in encoder.extensions:
+            return encoder
+    return None
+
+def output_formats():
+    """Nombres de los formatos registrados, en orden de registro."""
+    return tuple(ENCODERS)
+
+def supported_extensions():
+    """Extensiones de todos los formatos registrados, sin repetir."""
+    return tuple(dict.fromkeys(extension for encoder in ENCODERS.values() for extension in encoder.extensions))
+
+
+def _convert_jpeg(img):
+    return img if img.mode in ('RGB', 'L', 'CMYK') else img.convert('RGB')
+
+def _convert_png(img):
+    return img.convert('RGBA') if img.mode == 'P' else img
+
+def _convert_webp(img):
+    if img.mode in ('RGB', 'RGBA'):
+        return img
+    if img.mode in ('LA', 'PA', 'P'):
+        return img.convert('RGBA')
+    return img.convert('RGB')
+
+def _convert_png8(img):
+    # La paleta se calcula al guardar, después del redimensionado, que en modo P no puede interpolar
+    if img.mode in ('RGB', 'RGBA', 'L'):
+        return img
+    if img.mode in ('LA', 'PA') or 'transparency' in img.info:
+        return img.convert('RGBA')
+    return img.convert('RGB')
+
+def _save_png8(img, output, options):
+    # Paleta de 256 colores; las imágenes en escala de grises ya ocupan un byte por píxel
+    if img.mode == 'RGBA':
+        img = img.quantize(PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+    elif img.mode == 'RGB':
+        img = img.quantize(PALETTE_COLORS)
+    img.save(output, 'PNG', **options)
+
+def _webp_options(quality, settings):
+    method = settings['webp_method']
+    if settings['lossless']:
+        # Sin pérdida, `quality` es el esfuerzo de compresión: se deriva del mismo ajuste que `method`
+        return {'lossless': True, 'quality': round(method * 100 / WEBP_METHODS[-1]), 'method': method}
+    return {'quality': quality, 'method': method}
+
+
+register_encoder(Encoder('JPEG', ('.jpg', '.jpeg'), lambda quality, settings: {'quality': quality, 'optimize': True},
+                         convert=_convert_jpeg))
+register_encoder(Encoder('PNG', ('.png',), lambda quality, settings: {'optimize': True},
+                         lossy=lambda settings: False, convert=_convert_png))
+# PNG con paleta: con pérdida por la reducción de colores, pero sin una calidad que ajustar
+register_encoder(Encoder('PNG8', ('.png',), lambda quality, settings: {'optimize': True},
+                         lossy=lambda settings: False, convert=_convert_png8, save=_save_png8))
+register_encoder(Encoder('WEBP', ('.webp',), _webp_options, defaults={'webp_method': DEFAULT_WEBP_METHOD, 'lossless': False},
+                         lossy=lambda settings: not settings['lossless'], convert=_convert_webp))
@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+# Backends de ejecución disponibles para la compresión por lotes
+BACKENDS = ('threads', 'processes', 'hybrid')
+
+
+def default_backend():
+    """
+    Devuelve el backend recomendado según el número de núcleos disponibles.
+
+    :return: 'processes' si hay más de un núcleo, de lo contrario 'threads'.
+    """
+    return 'processes' if (os.cpu_count() or 1) > 1 else 'threads'
+
+def default_workers(backend):
+    """
+    Calcula el número de trabajadores por defecto para un backend.
+
+    :param backend: Nombre del backend ('threads', 'processes' o 'hybrid').
+    :return: Número de trabajadores de CPU a utilizar.
+    """
+    cpus = os.cpu_count() or 1
+    if backend == 'threads':
+        # Mismo criterio que ThreadPoolExecutor cuando no se indica max_workers
+        return min(32, cpus + 4)
+    return cpus
+
+
+class HybridExecutor(Executor):
+    """
+    Ejecutor híbrido: un pool de hilos realiza la lectura y escritura de archivos
+    y delega la decodificación, el redimensionado y la codificación en un pool de procesos.
+    """
+
+    def __init__(self, cpu_workers, io_workers=None):
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers or min(32, cpu_workers + 4))
+        self.cpu_pool = ProcessPoolExecutor(max_workers=cpu_workers)
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Envía la tarea al pool de E/S; la tarea usa `cpu_pool` para el trabajo pesado."""
+        return self.io_pool.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.io_pool.shutdown(wait, cancel_futures=cancel_futures)
+        self.cpu_pool.shutdown(wait, cancel_futures=cancel_futures)
+
+
+def create_executor(backend=None, workers=None):
+    """
+    Crea el ejecutor correspondiente al backend solicitado.
+
+    :param backend: 'threads', 'processes' o 'hybrid' (por defecto según los núcleos).
+    :param workers: Número de trabajadores (por defecto según los núcleos).
+    :return: Instancia de Executor lista para usarse como gestor de contexto.
+    """
+    backend = backend or default_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend no válido: {backend}. Opciones válidas son: {', '.join(BACKENDS)}.")
+    workers = workers or default_workers(backend)
+
+    if backend == 'threads':
+        return ThreadPoolExecutor(max_workers=workers)
+    if backend == 'processes':
+        return ProcessPoolExecutor(max_workers=workers)
+    return HybridExecutor(workers)
@@ -0,0 +1,127 @@
+import io
+import math
+from PIL import Image, ImageChops, ImageStat
+from functionalities.encoders import get_encoder
+
+
+def estimate_decoded_bytes(image_path):
+    """
+    Estima la memoria que ocupará una imagen decodificada leyendo solo su cabecera.
+
+    :param image_path: Ruta de la imagen.
+    :return: Ancho × alto × bandas en bytes, o 0 si la cabecera no se puede leer.
+    """
+    try:
+        with Image.open(image_path) as img:
+            return img.width * img.height * len(img.getbands())
+    except Exception:
+        return 0
+
+def scaled_size(size, resize_factor):
+    """
+    Calcula las dimensiones resultantes de aplicar un factor de reducción.
+
+    :param size: Tupla (ancho, alto) original.
+    :param resize_factor: Factor de escala.
+    :return: Tupla (ancho, alto) escalada, de al menos 1 píxel por lado.
+    """
+    width, height = size
+    return max(1, int(width * resize_factor)), max(1, int(height * resize_factor))
+
+def draft_for_size(img, target_size, convert_to_grayscale=False):
+    """
+    Activa la decodificación reducida de libjpeg (1/2, 1/4 o 1/8) cuando el tamaño objetivo lo permite.
+
+    Debe llamarse antes de cargar los píxeles. El tamaño resultante nunca es menor que el
+    objetivo, por lo que después se aplica el redimensionado final de alta calidad.
+
+    :param img: Imagen abierta y aún sin cargar.
+    :param target_size: Tupla (ancho, alto) final deseada.
+    :param convert_to_grayscale: Si es True, pide a libjpeg decodificar directamente en escala de grises.
+    """
+    if img.format != 'JPEG' or target_size[0] >= img.width or target_size[1] >= img.height:
+        return
+    img.draft('L' if convert_to_grayscale else img.mode, target_size)
+
+def draft_scale(resize_factor):
+    """
+    Reducción de libjpeg (1, 2, 4 u 8) que se puede aplicar al decodificar para un factor de escala.
+
+    Es la mayor cuya imagen decodificada no queda por debajo del tamaño final, por lo que todos
+    los factores de un mismo intervalo comparten la misma decodificación reducida.
+
+    :param resize_factor: Factor de escala final.
+    :return: Divisor del tamaño original.
+    """
+    scale = 1
+    while scale < 8 and resize_factor * scale * 2 <= 1:
+        scale *= 2
+    return scale
+
+# Estrategias de redimensionado: valor de `reducing_gap` para Image.resize.
+# Con un valor numérico, Pillow aplica primero una reducción entera por cajas (Image.reduce)
+# y termina con LANCZOS; cuanto menor el valor, más rápido y menos fiel.
+RESIZE_STRATEGIES = {
+    'quality': None,
+    'balanced': 3.0,
+    'fast': 2.0,
+}
+DEFAULT_RESIZE_STRATEGY = 'balanced'
+
+def resize_image(img, target_size, strategy=DEFAULT_RESIZE_STRATEGY):
+    """
+    Redimensiona una imagen con LANCZOS usando la estrategia de velocidad indicada.
+
+    :param img: Imagen cargada.
+    :param target_size: Tupla (ancho, alto) final.
+    :param strategy: Nombre de la estrategia ('quality', 'balanced' o 'fast').
+    :return: Imagen redimensionada.
+    """
+    return img.resize(target_size, Image.Resampling.LANCZOS, reducing_gap=RESIZE_STRATEGIES[strategy])
+
+def encode_to_bytes(img, image_format, resize_factor=1.0, resize_strategy=DEFAULT_RESIZE_STRATEGY, target_size=None, **save_options):
+    """
+    Redimensiona y codifica en memoria una imagen ya decodificada, sin tocar el disco.
+    Se puede llamar desde varios hilos a la vez con la misma imagen.
+
+    :param img: Imagen cargada (no se modifica).
+    :param image_format: Formato de salida; se codifica con su codificador registrado o, si no lo hay, con PIL.
+    :param resize_factor: Factor de escala a aplicar antes de codificar.
+    :param resize_strategy: Estrategia de redimensionado.
+    :param target_size: Tamaño final (ancho, alto); si se indica, sustituye a resize_factor
+                        (por ejemplo, cuando img se decodificó reducida con `draft_for_size`).
+    :param save_options: Opciones de codificación (quality, optimize...).
+    :return: Bytes de la imagen codificada.
+    """
+    target_size = target_size or scaled_size(img.size, resize_factor)
+    if img.size != target_size:
+        img = resize_image(img, target_size, resize_strategy)
+    else:
+        # Image.save guarda sus opciones en el propio objeto: cada codificación trabaja sobre su
+        # propia copia para que varios hilos puedan codificar la misma imagen.
+        img = img.copy()
+    buffer = io.BytesIO()
+    encoder = get_encoder(image_format)
+    if encoder is not None:
+        encoder.save(img, buffer, save_options)
+    else:
+        img.save(buffer, image_format, **save_options)
+    return buffer.getvalue()
+
+def psnr(reference, encoded):
+    """
+    Mide la fidelidad de una imagen codificada respecto a la imagen de la que se obtuvo.
+
+    La transparencia cuenta como un canal más, de modo que un formato que la pierde puntúa bajo.
+
+    :param reference: Imagen antes de codificar (RGB, RGBA o L) y del mismo tamaño.
+    :param encoded: Bytes de la imagen codificada.
+    :return: PSNR en dB (infinito si la codificación no tiene pérdidas).
+    """
+    with Image.open(io.BytesIO(encoded)) as img:
+        decoded = img.convert(reference.mode)
+    stat = ImageStat.Stat(ImageChops.difference(reference, decoded))
+    mse = sum(rms * rms for rms in stat.rms) / len(stat.rms)
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255 * 255 / mse)
@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+
+# Nombre del manifiesto que se guarda en la carpeta de salida
+MANIFEST_FILENAME = '.compression_manifest.jsonl'
+
+
+def params_hash(params):
+    """
+    Calcula un hash estable de los parámetros de compresión.
+
+    :param params: Diccionario con los parámetros de compresión.
+    :return: Cadena hexadecimal corta que identifica la combinación de parámetros.
+    """
+    encoded = json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+def file_signature(path):
+    """
+    Obtiene la firma de un archivo de origen (tamaño y fecha de modificación).
+
+    :param path: Ruta del archivo.
+    :return: Tupla (tamaño, mtime en nanosegundos).
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class BatchManifest:
+    """
+    Manifiesto persistente (JSON lines) de las imágenes ya comprimidas en una carpeta de salida.
+
+    Cada línea registra la ruta relativa de origen, su tamaño, su mtime, el hash de los
+    parámetros y la ruta de salida; la última línea de una misma ruta prevalece.
+    """
+
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, MANIFEST_FILENAME)
+        self.entries = {}
+        self._file = None
+        self._load()
+
+    def _load(self):
+        """Lee el manifiesto existente y lo compacta si acumula demasiadas líneas obsoletas."""
+        if not os.path.isfile(self.path):
+            return
+        lines = 0
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                lines += 1
+                self.entries[entry['source']] = entry
+        if lines > 2 * len(self.entries):
+            self._compact()
+
+    def _compact(self):
+        """Reescribe el manifiesto con una sola línea por imagen."""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        os.replace(temp_path, self.path)
+
+    def is_current(self, source, signature, params_key, output_path):
+        """
+        Indica si una imagen ya fue comprimida con los mismos datos de origen y parámetros.
+
+        :param source: Ruta relativa del archivo de origen.
+        :param signature: Tupla (tamaño, mtime) actual del origen.
+        :param params_key: Hash de los parámetros de compresión.
+        :param output_path: Ruta de salida esperada (None si no se conoce).
+        :return: Booleano que indica si se puede omitir la imagen.
+        """
+        entry = self.entries.get(source)
+        return (entry is not None
+                and (entry['size'], entry['mtime']) == tuple(signature)
+                and entry['params'] == params_key
+                and output_path is not None
+                and os.path.isfile(output_path))
+
+    def output_for(self, source):
+        """
+        Devuelve la ruta de salida registrada para una imagen.
+
+        :param source: Ruta relativa del archivo de origen.
+        :return: Ruta del archivo generado, o None si la imagen no está en el manifiesto.
+        """
+        entry = self.entries.get(source)
+        return entry['output'] if entry is not None else None
+
+    def record(self, source, signature, params_key, output_path):
+        """
+        Registra una imagen comprimida correctamente.
+
+        :param source: Ruta relativa del archivo de origen.
+        :param signature: Tupla (tamaño, mtime) del origen antes de comprimir.
+        :param params_key: Hash de los parámetros de compresión.
+        :param output_path: Ruta del archivo generado.
+        """
+        entry = {'source': source, 'size': signature[0], 'mtime': signature[1],
+                 'params': params_key, 'output': output_path}
+        self.entries[source] = entry
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def close(self):
+        """Cierra el archivo del manifiesto."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,136 @@
+import io
+from concurrent.futures import as_completed
+from PIL import Image
+from functionalities.size_search import MAX_QUALITY, MIN_QUALITY
+
+# NumPy es opcional: solo lo necesita la búsqueda de calidad perceptual
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# SSIM mínimo por defecto de la búsqueda perceptual
+DEFAULT_TARGET_SSIM = 0.98
+# Lado de la ventana uniforme con la que se calculan las medias y varianzas locales
+SSIM_WINDOW = 7
+# Constantes de estabilidad del SSIM para imágenes de 8 bits
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+# Píxeles de cada franja en la que se calcula el SSIM: acota la memoria de cada medida (unos 72 bytes por píxel de la franja)
+SSIM_STRIP_PIXELS = 1 << 18
+
+
+def numpy_available():
+    """Indica si NumPy está instalado y la búsqueda perceptual se puede usar."""
+    return np is not None
+
+def require_numpy():
+    """
+    Comprueba que NumPy está instalado antes de empezar una búsqueda perceptual.
+
+    :raises RuntimeError: Si NumPy no está instalado.
+    """
+    if np is None:
+        raise RuntimeError("La búsqueda de calidad perceptual necesita NumPy (pip install numpy).")
+
+def luma(img):
+    """
+    Obtiene la luminancia de una imagen como matriz de NumPy.
+
+    Las imágenes con transparencia se componen antes sobre negro, de modo que el color de los
+    píxeles transparentes, que los codificadores pueden descartar, no afecta a la medida.
+
+    :param img: Imagen de PIL en cualquier modo.
+    :return: Matriz uint8 (alto × ancho); se guarda con un byte por píxel y `ssim` la convierte por franjas.
+    """
+    if 'A' in img.getbands() or 'transparency' in img.info:
+        img = Image.alpha_composite(Image.new('RGBA', img.size, (0, 0, 0, 255)), img.convert('RGBA'))
+    return np.asarray(img if img.mode == 'L' else img.convert('L'), dtype=np.uint8)
+
+def decoded_luma(data):
+    """
+    Decodifica una imagen codificada en memoria y devuelve su luminancia.
+
+    :param data: Bytes de la imagen codificada.
+    :return: Matriz como la de `luma`.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        return luma(img)
+
+def _window_mean(values, size):
+    """Media de cada ventana size × size completamente dentro de la matriz, con una imagen integral."""
+    integral = np.pad(values, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    return (integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]) / (size * size)
+
+def ssim(reference, candidate, window=SSIM_WINDOW):
+    """
+    Calcula el SSIM medio entre dos matrices de luminancia del mismo tamaño, de forma vectorizada.
+
+    Se recorre la imagen por franjas horizontales de unos `SSIM_STRIP_PIXELS` píxeles, que se
+    solapan en `window` - 1 filas, de modo que el resultado es el mismo que con la imagen entera
+    pero la memoria de cada medida no crece con el tamaño de la imagen.
+
+    :param reference: Luminancia de la imagen de referencia (ver `luma`).
+    :param candidate: Luminancia de la imagen a evaluar.
+    :param window: Lado de la ventana uniforme; se reduce si la imagen es más pequeña.
+    :return: SSIM entre -1 y 1 (1 si las imágenes son idénticas).
+    """
+    window = max(1, min(window, *reference.shape))
+    height, width = reference.shape
+    rows = height - window + 1  # Filas de ventanas completas
+    step = max(1, SSIM_STRIP_PIXELS // width)
+    total = 0.0
+    for first in range(0, rows, step):
+        last = min(rows, first + step) + window - 1
+        x = reference[first:last].astype(np.float64)
+        y = candidate[first:last].astype(np.float64)
+        mean_x = _window_mean(x, window)
+        mean_y = _window_mean(y, window)
+        var_x = _window_mean(x * x, window) - mean_x * mean_x
+        var_y = _window_mean(y * y, window) - mean_y * mean_y
+        covariance = _window_mean(x * y, window) - mean_x * mean_y
+        ssim_map = ((2 * mean_x * mean_y + SSIM_C1) * (2 * covariance + SSIM_C2)
+                    / ((mean_x * mean_x + mean_y * mean_y + SSIM_C1) * (var_x + var_y + SSIM_C2)))
+        total += float(ssim_map.sum())
+    return total / (rows * (width - window + 1))
+
+def find_quality_for_ssim(probe, target, max_attempts=10, executor=None, parallelism=1,
+                          min_quality=MIN_QUALITY, max_quality=MAX_QUALITY):
+    """
+    Busca la calidad más baja cuya codificación alcanza el SSIM objetivo.
+
+    Se supone que el SSIM crece con la calidad. Cada ronda evalúa una calidad (o, con un
+    ejecutor y `parallelism` > 1, varias repartidas por el intervalo) y lo estrecha.
+
+    :param probe: Función calidad -> SSIM de la imagen codificada con esa calidad.
+    :param target: SSIM mínimo deseado.
+    :param max_attempts: Número máximo de rondas de codificación (codificaciones si no hay paralelismo).
+    :param executor: Ejecutor opcional para evaluar varias calidades por ronda.
+    :param parallelism: Calidades por ronda cuando hay ejecutor.
+    :param min_quality: Calidad mínima a probar.
+    :param max_quality: Calidad máxima a probar.
+    :return: Tupla ((calidad, SSIM) o None si ninguna calidad probada lo alcanza, número de codificaciones realizadas).
+    """
+    low, high = min_quality, max_quality
+    best = None
+    attempts = 0
+    rounds = 0
+    while low <= high and rounds < max_attempts:
+        count = min(parallelism if executor is not None else 1, high - low + 1)
+        qualities = sorted({low + (high - low) * (index + 1) // (count + 1) for index in range(count)})
+        if len(qualities) > 1:
+            futures = {executor.submit(probe, quality): quality for quality in qualities}
+            scores = {futures[future]: future.result() for future in as_completed(futures)}
+        else:
+            scores = {qualities[0]: probe(qualities[0])}
+        attempts += len(qualities)
+        rounds += 1
+
+        # La primera calidad que alcanza el objetivo acota por arriba; las anteriores, por abajo
+        for quality in qualities:
+            if scores[quality] >= target:
+                best = (quality, scores[quality])
+                high = quality - 1
+                break
+            low = quality + 1
+    return best, attempts
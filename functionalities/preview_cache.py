@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Prefijo de las carpetas de sesión, para reconocer las que dejó una sesión interrumpida
+SESSION_PREFIX = 'preview-'
+
+class PreviewCache:
+    """
+    Caché de vistas previas de una sesión: hash de los parámetros -> archivo codificado.
+
+    Cada sesión usa su propia carpeta temporal, por lo que varias vistas previas (o los
+    candidatos de la búsqueda automática) conviven sin sobrescribirse. Cuando los archivos
+    superan `max_bytes` se eliminan los menos usados recientemente, y `close` borra la carpeta
+    al terminar la sesión. Se puede usar desde varios hilos.
+    """
+
+    def __init__(self, parent_dir, max_bytes):
+        os.makedirs(parent_dir, exist_ok=True)
+        self.session_dir = tempfile.mkdtemp(prefix=SESSION_PREFIX, dir=parent_dir)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path_for(self, key, extension):
+        """
+        Devuelve la ruta donde escribir la entrada `key` antes de registrarla con `add`.
+
+        :param key: Hash de los parámetros de la vista previa.
+        :param extension: Extensión del archivo codificado (por ejemplo '.jpg').
+        :return: Ruta dentro de la carpeta de la sesión.
+        """
+        return os.path.join(self.session_dir, key + extension)
+
+    def get(self, key):
+        """
+        Busca una vista previa ya codificada y la marca como usada recientemente.
+
+        :param key: Hash de los parámetros de la vista previa.
+        :return: Ruta del archivo, o None si no está en la caché.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            path, _ = self._entries[key]
+        return path if os.path.exists(path) else None
+
+    def add(self, key, path):
+        """
+        Registra un archivo ya escrito en `path_for(key, ...)` y aplica el límite de tamaño.
+
+        :param key: Hash de los parámetros de la vista previa.
+        :param path: Ruta del archivo escrito.
+        :return: La misma ruta.
+        """
+        size = os.path.getsize(path)
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (path, size)
+            self.total_bytes += size
+            # Nunca se elimina la entrada recién añadida, aunque supere el límite por sí sola
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (evicted_path, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                evicted.append(evicted_path)
+        for evicted_path in evicted:
+            try:
+                os.remove(evicted_path)
+            except OSError:
+                pass
+        return path
+
+    def store(self, key, data, extension):
+        """
+        Guarda los bytes de una vista previa.
+
+        :param key: Hash de los parámetros de la vista previa.
+        :param data: Bytes codificados.
+        :param extension: Extensión del archivo codificado.
+        :return: Ruta del archivo guardado.
+        """
+        path = self.path_for(key, extension)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return self.add(key, path)
+
+    def close(self):
+        """Elimina la carpeta de la sesión y todas sus vistas previas."""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+        shutil.rmtree(self.session_dir, ignore_errors=True)
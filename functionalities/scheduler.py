@@ -0,0 +1,60 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# Múltiplo de trabajadores usado como ventana de tareas en vuelo por defecto
+DEFAULT_WINDOW_FACTOR = 2
+
+
+def default_max_in_flight(workers):
+    """
+    Calcula el número máximo de tareas en vuelo por defecto.
+
+    :param workers: Número de trabajadores del ejecutor.
+    :return: Tamaño de la ventana de tareas.
+    """
+    return max(1, workers * DEFAULT_WINDOW_FACTOR)
+
+def _collect_finished(pending):
+    """
+    Espera a que termine al menos una tarea y devuelve sus resultados, liberando sus referencias.
+
+    :param pending: Diccionario futuro -> (clave, coste) de las tareas en vuelo.
+    :return: Generador de tuplas (clave, resultado).
+    """
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        key, _ = pending.pop(future)
+        yield key, future.result()
+
+def run_bounded(executor, tasks, max_in_flight, memory_budget=None, estimate=None):
+    """
+    Ejecuta tareas manteniendo como máximo `max_in_flight` en vuelo y consumiendo
+    nuevas tareas solo cuando terminan las anteriores.
+
+    Si se indica un presupuesto de memoria, una tarea solo se admite mientras la suma
+    de los costes estimados en vuelo no lo supere; una tarea que por sí sola excede el
+    presupuesto se ejecuta en solitario.
+
+    :param executor: Ejecutor donde se envían las tareas.
+    :param tasks: Iterable (idealmente perezoso) de tuplas (clave, función, argumentos).
+    :param max_in_flight: Número máximo de tareas enviadas y no terminadas.
+    :param memory_budget: Presupuesto de memoria en bytes (None para no limitar).
+    :param estimate: Función clave -> coste estimado en bytes.
+    :return: Generador de tuplas (clave, resultado) en orden de finalización.
+    """
+    pending = {}
+    for key, fn, args in tasks:
+        cost = estimate(key) if memory_budget and estimate else 0
+
+        def must_wait():
+            if len(pending) >= max_in_flight:
+                return True
+            if memory_budget and pending:
+                in_use = sum(pending_cost for _, pending_cost in pending.values())
+                return in_use + cost > memory_budget
+            return False
+
+        while must_wait():
+            yield from _collect_finished(pending)
+        pending[executor.submit(fn, *args)] = (key, cost)
+    while pending:
+        yield from _collect_finished(pending)
@@ -0,0 +1,303 @@
+import math
+from concurrent.futures import as_completed
+
+# Límites de la búsqueda del tamaño objetivo
+MIN_QUALITY = 20
+MAX_QUALITY = 100
+MIN_RESIZE_FACTOR = 0.1
+# Fracción del peso máximo que se acepta como mínimo de la ventana objetivo
+TARGET_WINDOW = 0.8
+# Precisión con la que se busca el factor de reducción
+RESIZE_FACTOR_PRECISION = 0.01
+
+# Lado máximo del proxy reducido con el que se estima el tamaño
+PROXY_MAX_SIDE = 384
+# Calidades codificadas sobre el proxy para construir el modelo de tamaño
+MODEL_QUALITIES = (20, 50, 75, 90, 100)
+# Rondas de codificación guiadas por el modelo antes de recurrir a la bisección
+SEEDED_PROBES = 2
+# Separación entre los candidatos vecinos de la predicción en la búsqueda paralela
+SEED_QUALITY_SPREAD = 4
+SEED_RESIZE_SPREAD = 0.04
+
+
+class SizeModel:
+    """
+    Modelo ligero del tamaño codificado en función de la calidad y del factor de reducción.
+
+    Se construye a partir de unas pocas codificaciones de un proxy reducido, escaladas por la
+    relación de áreas. El tamaño entre calidades muestreadas se interpola en escala logarítmica
+    y se supone proporcional al área para los factores de reducción. Cada codificación real
+    corrige el modelo con `calibrate`.
+    """
+
+    def __init__(self, samples):
+        """
+        :param samples: Diccionario calidad -> tamaño estimado en KB a resolución completa.
+        """
+        self.samples = sorted(samples.items())
+        self.correction = 1.0
+
+    def predict(self, quality, resize_factor=1.0):
+        """
+        Predice el tamaño en KB de una codificación.
+
+        :param quality: Calidad de compresión.
+        :param resize_factor: Factor de reducción.
+        :return: Tamaño estimado en KB.
+        """
+        points = self.samples
+        if quality <= points[0][0]:
+            size_kb = points[0][1]
+        elif quality >= points[-1][0]:
+            size_kb = points[-1][1]
+        else:
+            for (q0, s0), (q1, s1) in zip(points, points[1:]):
+                if q0 <= quality <= q1:
+                    t = (quality - q0) / (q1 - q0)
+                    size_kb = math.exp(math.log(s0) + t * (math.log(s1) - math.log(s0)))
+                    break
+        return size_kb * resize_factor ** 2 * self.correction
+
+    def solve(self, target_kb):
+        """
+        Propone la calidad (y, si no basta, el factor de reducción) que debería acercarse al objetivo.
+
+        :param target_kb: Tamaño objetivo en KB.
+        :return: Tupla (calidad, factor).
+        """
+        for quality in range(MAX_QUALITY, MIN_QUALITY - 1, -1):
+            if self.predict(quality) <= target_kb:
+                return quality, 1.0
+        resize_factor = math.sqrt(target_kb / self.predict(MIN_QUALITY))
+        return MIN_QUALITY, round(min(max(resize_factor, MIN_RESIZE_FACTOR), 0.99), 2)
+
+    def calibrate(self, quality, resize_factor, size_kb):
+        """
+        Ajusta el modelo con el tamaño real de una codificación.
+
+        :param quality: Calidad codificada.
+        :param resize_factor: Factor de reducción codificado.
+        :param size_kb: Tamaño real en KB.
+        """
+        predicted = self.predict(quality, resize_factor)
+        if predicted > 0 and size_kb > 0:
+            self.correction *= size_kb / predicted
+
+
+def build_size_model(img, encode, max_side=PROXY_MAX_SIDE):
+    """
+    Construye un SizeModel codificando un proxy reducido de la imagen.
+
+    :param img: Imagen decodificada (no se modifica).
+    :param encode: Función (imagen, calidad) -> bytes codificados.
+    :param max_side: Lado máximo del proxy.
+    :return: SizeModel con tamaños estimados a resolución completa.
+    """
+    proxy = img.copy()
+    proxy.thumbnail((max_side, max_side))
+    area_ratio = (img.width * img.height) / (proxy.width * proxy.height)
+    samples = {quality: max(len(encode(proxy, quality)), 1) / 1024 * area_ratio for quality in MODEL_QUALITIES}
+    return SizeModel(samples)
+
+
+def _spread(low, high, count, as_int):
+    """
+    Reparte `count` puntos equiespaciados dentro del intervalo (sin incluir los extremos si hay más de uno).
+
+    :return: Lista de candidatos redondeados a enteros o a centésimas.
+    """
+    points = []
+    for i in range(count):
+        value = low + (high - low) * (i + 1) / (count + 1) if count > 1 else (low + high) / 2
+        points.append(int(value + 0.5) if as_int else round(value, 2))
+    return points
+
+
+class SizeSearch:
+    """
+    Búsqueda del par (calidad, factor de reducción) que deja una imagen dentro de la
+    ventana [TARGET_WINDOW × max_kb, max_kb].
+
+    Si hay un modelo de tamaño, primero se prueban sus predicciones (recalibrándolo con
+    cada resultado real). Después se biseca la calidad con el factor 1.0 y, si ni la calidad
+    mínima cabe en el peso máximo, el factor de reducción con la calidad mínima; cada
+    codificación estrecha los intervalos de ambas bisecciones.
+
+    Con un ejecutor y `parallelism` > 1, cada ronda evalúa varios candidatos a la vez
+    (alrededor de la predicción o repartidos por el intervalo) y cancela los pendientes en
+    cuanto uno cae en la ventana objetivo.
+    """
+
+    def __init__(self, probe, max_kb, max_attempts=10, model=None, executor=None, parallelism=1,
+                 min_quality=MIN_QUALITY, max_quality=MAX_QUALITY):
+        """
+        :param probe: Función (calidad, factor) -> tamaño en KB de la imagen codificada.
+        :param max_kb: Peso máximo deseado en KB.
+        :param max_attempts: Número máximo de rondas de codificación (codificaciones si no hay paralelismo).
+        :param model: SizeModel opcional para sembrar la búsqueda.
+        :param executor: Ejecutor opcional para evaluar candidatos en paralelo.
+        :param parallelism: Candidatos por ronda cuando hay ejecutor.
+        :param min_quality: Calidad mínima a probar (igual a `max_quality` en formatos sin calidad).
+        :param max_quality: Calidad máxima a probar.
+        """
+        self.probe = probe
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.max_kb = max_kb
+        self.min_kb = max_kb * TARGET_WINDOW
+        self.max_attempts = max_attempts
+        self.model = model
+        self.executor = executor
+        self.parallelism = max(1, parallelism) if executor is not None else 1
+        self.attempts = 0
+        self.rounds = 0
+        self.best = None  # (calidad, factor, tamaño_kb)
+        self.needs_resize = False
+        self.quality_bounds = [self.min_quality, self.max_quality]
+        self.resize_bounds = [MIN_RESIZE_FACTOR, 1.0]
+        self._probed = {}
+
+    def _record(self, quality, resize_factor, size_kb):
+        """Registra el tamaño de un candidato y actualiza el mejor resultado y los intervalos."""
+        self.attempts += 1
+        self._probed[(quality, resize_factor)] = size_kb
+        fits = size_kb <= self.max_kb
+        if fits and (self.best is None or size_kb > self.best[2]):
+            self.best = (quality, resize_factor, size_kb)
+
+        if resize_factor == 1.0:
+            if fits:
+                self.quality_bounds[0] = max(self.quality_bounds[0], quality + 1)
+            else:
+                self.quality_bounds[1] = min(self.quality_bounds[1], quality - 1)
+        if quality == self.min_quality:
+            if fits:
+                self.resize_bounds[0] = max(self.resize_bounds[0], resize_factor)
+            else:
+                self.resize_bounds[1] = min(self.resize_bounds[1], resize_factor)
+                # Si ni reducida cabe con la calidad mínima, tampoco cabrá a tamaño completo
+                self.quality_bounds[1] = self.min_quality - 1
+        return size_kb
+
+    def _evaluate(self, candidates):
+        """
+        Codifica una ronda de candidatos no probados todavía.
+
+        :param candidates: Lista de tuplas (calidad, factor).
+        :return: True si alguno cae en la ventana, False si no, None si no había candidatos nuevos.
+        """
+        candidates = [c for c in dict.fromkeys(candidates) if c not in self._probed][:self.parallelism]
+        if not candidates:
+            return None
+        self.rounds += 1
+
+        if len(candidates) == 1:
+            quality, resize_factor = candidates[0]
+            return self._in_window(self._record(quality, resize_factor, self.probe(quality, resize_factor)))
+
+        futures = {self.executor.submit(self.probe, quality, resize_factor): (quality, resize_factor)
+                   for quality, resize_factor in candidates}
+        try:
+            for future in as_completed(futures):
+                quality, resize_factor = futures[future]
+                if self._in_window(self._record(quality, resize_factor, future.result())):
+                    return True
+        finally:
+            # Cancelar los candidatos que aún no empezaron
+            for future in futures:
+                future.cancel()
+        return False
+
+    def _in_window(self, size_kb):
+        return self.min_kb <= size_kb <= self.max_kb
+
+    def _exhausted(self):
+        return self.rounds >= self.max_attempts
+
+    def _seed_candidates(self, quality, resize_factor):
+        """Candidatos de una ronda guiada: la predicción y, si hay paralelismo, sus vecinos."""
+        candidates = [(quality, resize_factor)]
+        for step in range(1, self.parallelism):
+            offset = (step + 1) // 2 * (1 if step % 2 else -1)
+            if resize_factor == 1.0:
+                neighbour = min(max(quality + offset * SEED_QUALITY_SPREAD, self.quality_bounds[0]), self.quality_bounds[1])
+                candidates.append((neighbour, 1.0))
+            else:
+                neighbour = min(max(resize_factor + offset * SEED_RESIZE_SPREAD, self.resize_bounds[0]), 0.99)
+                candidates.append((quality, round(neighbour, 2)))
+        return candidates
+
+    def _search_model(self):
+        """Prueba las predicciones del modelo, recalibrándolo con cada codificación real."""
+        target_kb = (self.min_kb + self.max_kb) / 2
+        for _ in range(SEEDED_PROBES):
+            if self._exhausted():
+                break
+            quality, resize_factor = self.model.solve(target_kb)
+            self.needs_resize = resize_factor < 1.0
+            found = self._evaluate(self._seed_candidates(quality, resize_factor))
+            if found is None:
+                break
+            if found:
+                return True
+            if (quality, resize_factor) in self._probed:
+                self.model.calibrate(quality, resize_factor, self._probed[(quality, resize_factor)])
+        return False
+
+    def _search_quality(self):
+        """Bisección (o búsqueda k-aria si hay paralelismo) de la calidad con el factor de reducción 1.0."""
+        while self.quality_bounds[0] <= self.quality_bounds[1] and not self._exhausted():
+            low, high = self.quality_bounds
+            qualities = _spread(low, high, min(self.parallelism, high - low + 1), as_int=True)
+            found = self._evaluate([(quality, 1.0) for quality in qualities])
+            if found is None:
+                break
+            if found:
+                return True
+        return False
+
+    def _search_resize_factor(self):
+        """Bisección (o búsqueda k-aria si hay paralelismo) del factor de reducción con la calidad mínima."""
+        while self.resize_bounds[1] - self.resize_bounds[0] > RESIZE_FACTOR_PRECISION and not self._exhausted():
+            low, high = self.resize_bounds
+            found = self._evaluate([(self.min_quality, resize_factor) for resize_factor in _spread(low, high, self.parallelism, as_int=False)])
+            if found is None:
+                break
+            if found:
+                return True
+        return False
+
+    def run(self):
+        """
+        Ejecuta la búsqueda.
+
+        :return: Tupla (calidad, factor, tamaño_kb) del mejor candidato que no supera el peso máximo, o None.
+        """
+        if self.model is not None and self._search_model():
+            return self.best
+        # Si el modelo indica que hace falta reducir la resolución, se empieza por esa fase
+        if self.needs_resize and self._search_resize_factor():
+            return self.best
+        if not self._search_quality() and self.best is None:
+            self._search_resize_factor()
+        return self.best
+
+
+def find_target_compression(probe, max_kb, max_attempts=10, model=None, executor=None, parallelism=1,
+                            min_quality=MIN_QUALITY, max_quality=MAX_QUALITY):
+    """
+    Busca la configuración de compresión que se acerca al peso máximo sin superarlo.
+
+    :param probe: Función (calidad, factor) -> tamaño en KB de la imagen codificada.
+    :param max_kb: Peso máximo deseado en KB.
+    :param max_attempts: Número máximo de rondas de codificación.
+    :param model: SizeModel opcional para sembrar la búsqueda.
+    :param executor: Ejecutor opcional para evaluar varios candidatos por ronda.
+    :param parallelism: Candidatos por ronda cuando hay ejecutor.
+    :param min_quality: Calidad mínima a probar.
+    :param max_quality: Calidad máxima a probar.
+    :return: Tupla ((calidad, factor, tamaño_kb) o None, número de codificaciones realizadas).
+    """
+    search = SizeSearch(probe, max_kb, max_attempts, model, executor, parallelism, min_quality, max_quality)
+    return search.run(), search.attempts
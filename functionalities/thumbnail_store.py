@@ -0,0 +1,170 @@
+import io
+import os
+import hashlib
+import threading
+from PIL import Image
+from functionalities.content_cache import hash_file
+
+# Carpeta compartida por la interfaz gráfica y el modo de miniaturas del compresor por lotes
+DEFAULT_STORE_DIR = os.path.join('.', 'cache', 'thumbnails')
+DEFAULT_STORE_SIZE = 512 * 1024 * 1024
+# Tamaños que usa la interfaz gráfica: vista previa y cuadrícula del modo carpeta
+DEFAULT_THUMBNAIL_SIZES = ((200, 200), (128, 128))
+THUMBNAIL_QUALITY = 85
+SIGNATURES_DIR = 'signatures'
+
+
+def create_thumbnail(image_path, size):
+    """
+    Genera la miniatura de una imagen con decodificación reducida (modo draft en JPEG).
+
+    :param image_path: Ruta de la imagen.
+    :param size: Tupla (ancho, alto) máxima.
+    :return: Miniatura en RGB o escala de grises.
+    """
+    with Image.open(image_path) as img:
+        img.thumbnail(size)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img.load()
+        return img
+
+
+class ThumbnailStore:
+    """
+    Almacén persistente de miniaturas en disco, direccionado por el hash del contenido y el tamaño.
+
+    Las miniaturas se guardan como JPEG repartidas en subcarpetas por prefijo del hash, igual
+    que la caché por contenido. Para no leer el archivo completo en cada consulta, el hash de
+    cada ruta se recuerda junto con su fecha de modificación y tamaño. La fecha de modificación
+    de cada entrada se actualiza al usarla, de modo que `evict` elimina las menos usadas
+    recientemente hasta respetar `max_bytes`. El objeto solo guarda rutas, por lo que se
+    puede usar desde hilos y enviar a procesos trabajadores.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, max_bytes=DEFAULT_STORE_SIZE):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        os.makedirs(store_dir, exist_ok=True)
+
+    def content_hash(self, image_path):
+        """
+        Devuelve el hash del contenido de una imagen, reutilizando el calculado si el archivo no cambió.
+
+        :param image_path: Ruta de la imagen.
+        :return: Hash SHA-256 en hexadecimal.
+        """
+        stat = os.stat(image_path)
+        signature = hashlib.sha1(f"{os.path.abspath(image_path)}:{stat.st_mtime_ns}:{stat.st_size}".encode('utf-8')).hexdigest()
+        signature_path = os.path.join(self.store_dir, SIGNATURES_DIR, signature[:2], signature)
+        try:
+            with open(signature_path, encoding='utf-8') as f:
+                content_hash = f.read().strip()
+            if content_hash:
+                os.utime(signature_path)
+                return content_hash
+        except OSError:
+            pass
+
+        content_hash = hash_file(image_path)
+        self._write(signature_path, content_hash.encode('utf-8'))
+        return content_hash
+
+    def _entry_path(self, content_hash, size):
+        width, height = size
+        return os.path.join(self.store_dir, content_hash[:2], f"{content_hash}-{width}x{height}.jpg")
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _store(self, entry_path, thumbnail):
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, 'JPEG', quality=THUMBNAIL_QUALITY)
+        self._write(entry_path, buffer.getvalue())
+
+    def get(self, image_path, size):
+        """
+        Devuelve la miniatura de una imagen, generándola y guardándola si no estaba en el almacén.
+
+        :param image_path: Ruta de la imagen.
+        :param size: Tupla (ancho, alto) máxima.
+        :return: Miniatura cargada en memoria.
+        """
+        entry_path = self._entry_path(self.content_hash(image_path), size)
+        try:
+            with Image.open(entry_path) as img:
+                img.load()
+            os.utime(entry_path)
+            return img
+        except OSError:
+            pass
+
+        thumbnail = create_thumbnail(image_path, size)
+        self._store(entry_path, thumbnail)
+        return thumbnail
+
+    def ensure(self, image_path, sizes=DEFAULT_THUMBNAIL_SIZES):
+        """
+        Garantiza que el almacén tiene las miniaturas de una imagen, decodificándola a lo sumo una vez.
+
+        :param image_path: Ruta de la imagen.
+        :param sizes: Tamaños de miniatura a generar.
+        :return: Número de miniaturas generadas (0 si ya estaban todas).
+        """
+        content_hash = self.content_hash(image_path)
+        missing = []
+        for size in sizes:
+            entry_path = self._entry_path(content_hash, size)
+            try:
+                os.utime(entry_path)
+            except OSError:
+                missing.append((size, entry_path))
+        if not missing:
+            return 0
+
+        # La miniatura más grande sirve de origen para las demás
+        missing.sort(key=lambda item: item[0], reverse=True)
+        largest = create_thumbnail(image_path, missing[0][0])
+        for size, entry_path in missing:
+            thumbnail = largest
+            if size != missing[0][0]:
+                thumbnail = largest.copy()
+                thumbnail.thumbnail(size)
+            self._store(entry_path, thumbnail)
+        return len(missing)
+
+    def evict(self):
+        """
+        Elimina las miniaturas y firmas menos usadas recientemente hasta que el almacén no supere `max_bytes`.
+
+        :return: Número de archivos eliminados.
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.store_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -1,4 +1,5 @@
 import os
+from functionalities.encoders import output_formats
 
 def validate_folder_path(path):
     """
@@ -29,8 +30,7 @@ def validate_output_format(value):
     :param value: Formato de salida a validar.
     :return: Formato válido si es reconocido, de lo contrario, None.
     """
-    valid_formats = ['JPEG', 'PNG']
-    return value.upper() if value.upper() in valid_formats else None
+    return value.upper() if value.upper() in output_formats() else None
 
 def validate_output_path(path):
     # Lista de carpetas válidas
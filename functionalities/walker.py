@@ -0,0 +1,48 @@
+import os
+from fnmatch import fnmatch
+
+
+def _matches(rel_path, name, patterns):
+    """
+    Indica si una ruta relativa o su nombre coincide con alguno de los patrones glob.
+
+    :param rel_path: Ruta relativa a la carpeta de origen, con separadores '/'.
+    :param name: Nombre del archivo o carpeta.
+    :param patterns: Lista de patrones glob.
+    :return: Booleano que indica si hay coincidencia.
+    """
+    return any(fnmatch(rel_path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+def iter_image_files(folder_path, extensions, recursive=False, include=None, exclude=None, skip_dirs=()):
+    """
+    Recorre una carpeta de forma perezosa con os.scandir y devuelve las rutas de imagen a medida que las encuentra.
+
+    :param folder_path: Carpeta de origen.
+    :param extensions: Tupla de extensiones aceptadas (en minúsculas, con punto).
+    :param recursive: Si es True, recorre también las subcarpetas.
+    :param include: Patrones glob que deben cumplir los archivos (si se indican).
+    :param exclude: Patrones glob de archivos o carpetas a omitir.
+    :param skip_dirs: Carpetas que nunca se recorren (por ejemplo, la carpeta de salida).
+    :return: Generador de rutas de archivo.
+    """
+    include = include or []
+    exclude = exclude or []
+    skip_dirs = {os.path.realpath(path) for path in skip_dirs}
+    pending_dirs = [folder_path]
+
+    while pending_dirs:
+        current = pending_dirs.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    rel_path = os.path.relpath(entry.path, folder_path).replace(os.sep, '/')
+                    if exclude and _matches(rel_path, entry.name, exclude):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and os.path.realpath(entry.path) not in skip_dirs:
+                            pending_dirs.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(extensions):
+                        if not include or _matches(rel_path, entry.name, include):
+                            yield entry.path
+        except OSError as e:
+            print(f"No se pudo leer la carpeta {current}: {e}")
@@ -1,14 +1,54 @@
+import io
 import os
+import queue
+import atexit
+import shutil
+import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 from functionalities.validations import validate_folder_path, validate_quality, validate_output_path
+from functionalities.content_cache import ContentCache, hash_file
+from functionalities.decoded_cache import DecodedImageCache
+from functionalities.preview_cache import SESSION_PREFIX, PreviewCache
+from functionalities.thumbnail_store import ThumbnailStore
+from functionalities.manifest import file_signature, params_hash
+from functionalities.size_search import MAX_QUALITY, build_size_model, find_target_compression
+from functionalities.imaging import DEFAULT_RESIZE_STRATEGY, RESIZE_STRATEGIES, draft_for_size, draft_scale, encode_to_bytes, resize_image, scaled_size
+from functionalities.perceptual import DEFAULT_TARGET_SSIM, decoded_luma, find_quality_for_ssim, luma, numpy_available, ssim
+from functionalities.encoders import DEFAULT_WEBP_METHOD, WEBP_METHODS, encoder_for_path, get_encoder, output_formats, supported_extensions
+from functionalities.walker import iter_image_files
+from image_compressor_in_folder import STATUS_OK, compress_images_in_folder
 
 
 
 # Constantes
 CACHE_DIR = './cache'
 CARPETAS_A_VERIFICAR = ["Desktop", "Documents", "Downloads"]
+CONTENT_CACHE_DIR = os.path.join(CACHE_DIR, 'content')
+CONTENT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PREVIEW_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Vistas previas codificadas que se conservan durante la sesión
+ORIGINAL_FORMAT = 'Original'  # Mantener el formato de la imagen de origen
+# Formato de salida (None para el original) y ajustes de WebP usados cuando no se indican otros
+DEFAULT_ENCODING = {'format': None, 'webp_method': DEFAULT_WEBP_METHOD, 'lossless': False}
+DECODED_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Memoria para imágenes de origen ya decodificadas
+SEARCH_PARALLELISM = min(8, os.cpu_count() or 1)  # Candidatos evaluados a la vez en la búsqueda automática
+POLL_INTERVAL_MS = 50  # Intervalo de sondeo de las tareas en segundo plano
+PROGRESS_INTERVAL_MS = 15
+THUMBNAIL_SIZE = (200, 200)  # Tamaño máximo de las miniaturas mostradas en la interfaz
+THUMBNAIL_STORE_DIR = os.path.join(CACHE_DIR, 'thumbnails')  # Compartido con el compresor por lotes
+THUMBNAIL_STORE_MAX_BYTES = 512 * 1024 * 1024
+GRID_THUMBNAIL_SIZE = (128, 128)  # Miniaturas de la cuadrícula del modo carpeta
+GRID_CELL_WIDTH = 150
+GRID_CELL_HEIGHT = 170
+GRID_NAME_LENGTH = 20  # Caracteres del nombre mostrados bajo cada miniatura
+GRID_THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)
+GRID_THUMBNAIL_MEMORY_ITEMS = 600  # Miniaturas de la cuadrícula conservadas en memoria
+GRID_LISTING_BATCH = 500  # Archivos que se añaden a la cuadrícula de una vez mientras se lista la carpeta
+LIVE_PREVIEW_DELAY_MS = 300  # Espera tras el último cambio antes de recalcular la vista previa en vivo
+LIVE_PREVIEW_MAX_SIDE = 1024  # Lado máximo de la copia de trabajo de la vista previa en vivo
 
 
 
@@ -19,123 +59,444 @@ def create_cache_folder():
         os.makedirs(CACHE_DIR)
 
 def clear_cache():
-    """Elimina todos los archivos en la carpeta de caché."""
+    """Elimina los archivos de la carpeta de caché y las carpetas de vistas previas que dejaron sesiones interrumpidas."""
     for filename in os.listdir(CACHE_DIR):
         file_path = os.path.join(CACHE_DIR, filename)
         if os.path.isfile(file_path):
             os.remove(file_path)
-
-def get_cache_file_path():
-    """Devuelve la ruta del archivo de caché para la imagen comprimida temporalmente."""
-    return os.path.join(CACHE_DIR, 'temp_compressed_image.jpg')
+        elif filename.startswith(SESSION_PREFIX) and os.path.isdir(file_path):
+            shutil.rmtree(file_path, ignore_errors=True)
+
+def output_params(input_path, image_format, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding=DEFAULT_ENCODING):
+    """
+    Describe todo lo que determina los bytes que compress_image escribiría en el formato indicado.
+
+    Su hash es la clave de la caché de vistas previas. Incluye la firma del archivo de origen,
+    de modo que una modificación en disco invalida las vistas previas anteriores.
+    """
+    return {
+        'source': (os.path.abspath(input_path), *file_signature(input_path)),
+        'format': image_format,
+        'quality': quality,
+        'resize_factor': resize_factor,
+        'convert_to_grayscale': convert_to_grayscale,
+        'resize_strategy': resize_strategy,
+        'webp_method': encoding['webp_method'],
+        'lossless': encoding['lossless'],
+    }
+
+def resolve_output_format(input_path, encoding=DEFAULT_ENCODING):
+    """Devuelve el formato de salida para PIL: el elegido o, si se mantiene el original, el de la imagen de origen."""
+    if encoding['format']:
+        return encoding['format']
+    encoder = encoder_for_path(input_path)
+    return encoder.name if encoder is not None else 'JPEG'
+
+def encoding_options(image_format, quality, encoding=DEFAULT_ENCODING):
+    """Opciones del codificador registrado del formato para la calidad y los ajustes indicados."""
+    return get_encoder(image_format).options(quality, encoding)
 
 
 
 # Funciones de Compresión de Imágenes
-def compress_image(input_path, output_path, quality=85, resize_factor=1.0, convert_to_grayscale=False):
-    """Comprime una imagen y la guarda en el directorio de salida especificado."""
+def compress_image(input_path, output_path, quality=85, resize_factor=1.0, convert_to_grayscale=False, resize_strategy=DEFAULT_RESIZE_STRATEGY,
+                   encoding=DEFAULT_ENCODING, image_format=None):
+    """
+    Comprime una imagen y la guarda en el directorio de salida especificado.
+
+    El formato es el resuelto por `resolve_output_format` y no se deduce de la extensión de
+    `output_path`, que puede ser la misma para varios formatos (PNG y PNG8).
+
+    Se ejecuta fuera del hilo de Tk, por lo que no muestra diálogos: los errores se
+    propagan y se describen con `describe_error`. Parte de la imagen de origen decodificada
+    en caché, de modo que la vista previa y el guardado final no vuelven a decodificarla.
+    """
+    image_format = image_format or resolve_output_format(input_path, encoding)
+    source, full_size = load_source_image(input_path, convert_to_grayscale, image_format, draft_scale(resize_factor))
+    data = encode_to_bytes(source, image_format, resize_strategy=resize_strategy, target_size=scaled_size(full_size, resize_factor),
+                           **encoding_options(image_format, quality, encoding))
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    print(f"Imagen comprimida y guardada: {output_path}")
+    return data  # Retorna los bytes de la imagen comprimida
+
+def describe_error(error):
+    """Devuelve el mensaje que se muestra al usuario para un error de compresión."""
+    if isinstance(error, FileNotFoundError):
+        return "El archivo de entrada no se encuentra."
+    if isinstance(error, PermissionError):
+        return "Permiso denegado para acceder al archivo o directorio."
+    if isinstance(error, IOError):
+        return f"Error de entrada/salida: {error}"
+    return f"Error inesperado: {error}"
+
+def load_source_image(input_path, convert_to_grayscale=False, image_format='JPEG', scale=1):
+    """
+    Decodifica la imagen de origen una sola vez, con las conversiones de la compresión al formato indicado, y la guarda en caché.
+
+    Con `scale` > 1 los JPEG se decodifican reducidos por libjpeg (ver `draft_scale`); cada
+    reducción se guarda como una variante propia, de modo que la vista previa, la búsqueda y el
+    guardado final de un mismo factor parten de la misma decodificación y producen los mismos bytes.
+    Los demás formatos no admiten esa reducción y comparten siempre la variante a tamaño completo.
+    Devuelve la imagen y el tamaño original, del que se calcula el tamaño final.
+    """
+    if scale > 1:
+        with Image.open(input_path) as img:  # Solo lee la cabecera
+            if img.format != 'JPEG':
+                scale = 1
+
+    def load():
+        with Image.open(input_path) as img:
+            full_size = img.size
+            draft_for_size(img, (-(-img.width // scale), -(-img.height // scale)), convert_to_grayscale)
+            if convert_to_grayscale:
+                return img.convert('L'), full_size
+            img.load()
+            converted = get_encoder(image_format).convert(img)
+            return (converted if converted is not img else img.copy()), full_size
+
+    return decoded_cache.get(input_path, ('source', convert_to_grayscale, image_format, scale), load)
+
+def compress_and_cache_image(input_path, quality=85, resize_factor=1.0, convert_to_grayscale=False, resize_strategy=DEFAULT_RESIZE_STRATEGY,
+                             encoding=DEFAULT_ENCODING):
+    """
+    Comprime una imagen en la caché de vistas previas de la sesión y devuelve la ruta.
+
+    Una configuración ya previsualizada se devuelve al instante; si no, se reutiliza el
+    resultado de entradas idénticas de la caché por contenido antes de comprimir.
+
+    :return: Tupla (ruta, bytes); los bytes solo se devuelven si se acaban de comprimir.
+    """
+    image_format = resolve_output_format(input_path, encoding)
+    extension = get_encoder(image_format).extension
+    preview_key = params_hash(output_params(input_path, image_format, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding))
+    cache_path = preview_cache.get(preview_key)
+    if cache_path is not None:
+        return cache_path, None
+
+    cache_path = preview_cache.path_for(preview_key, extension)
+    params_key = params_hash({'format': image_format, 'quality': quality, 'resize_factor': resize_factor, 'convert_to_grayscale': convert_to_grayscale,
+                              'resize_strategy': resize_strategy, 'webp_method': encoding['webp_method'], 'lossless': encoding['lossless']})
     try:
+        cache_key = content_cache.key(hash_file(input_path), params_key, extension)
+    except OSError:
+        cache_key = None
+    data = None
+    if not (cache_key and content_cache.fetch(cache_key, cache_path)):
+        data = compress_image(input_path, cache_path, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding, image_format)
+        if cache_key:
+            content_cache.store(cache_key, cache_path)
+            content_cache.note_stores()
+    return preview_cache.add(preview_key, cache_path), data
+
+def load_working_copy(input_path, convert_to_grayscale=False, image_format='JPEG'):
+    """
+    Decodifica una copia reducida de la imagen de origen para la vista previa en vivo.
+
+    La copia se guarda en la caché de imágenes decodificadas, así que los cambios de calidad o
+    de reducción no vuelven a decodificar el archivo.
+
+    :return: Tupla (copia de trabajo, dimensiones originales).
+    """
+    def load():
         with Image.open(input_path) as img:
+            full_size = img.size
+            preview_size = scaled_size(full_size, min(1.0, LIVE_PREVIEW_MAX_SIDE / max(full_size)))
+            draft_for_size(img, preview_size, convert_to_grayscale)
             if convert_to_grayscale:
                 img = img.convert('L')
             else:
-                if img.mode in ('RGBA', 'LA'):
-                    img = img.convert('RGB')
-
-            if resize_factor != 1.0:
-                width, height = img.size
-                img = img.resize((int(width * resize_factor), int(height * resize_factor)), Image.Resampling.LANCZOS)
-
-            img.save(output_path, quality=quality, optimize=True)
-            print(f"Imagen comprimida y guardada: {output_path}")
-            return img  # Retorna la imagen comprimida
-    except FileNotFoundError:
-        messagebox.showerror("Error", "El archivo de entrada no se encuentra.")
-    except PermissionError:
-        messagebox.showerror("Error", "Permiso denegado para acceder al archivo o directorio.")
-    except IOError as e:
-        messagebox.showerror("Error", f"Error de entrada/salida: {e}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Error inesperado: {e}")
+                img = get_encoder(image_format).convert(img)
+            if img.size != preview_size:
+                img = resize_image(img, preview_size, 'fast')
+            img.load()
+        return img, full_size
+
+    return decoded_cache.get(input_path, ('working', convert_to_grayscale, image_format), load)
 
-def compress_and_cache_image(input_path, quality=85, resize_factor=1.0, convert_to_grayscale=False):
-    """Comprime una imagen y la guarda en la caché temporalmente."""
-    cache_path = get_cache_file_path()
-    compress_image(input_path, cache_path, quality, resize_factor, convert_to_grayscale)
-    return cache_path
+def render_live_preview(task, input_path, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding=DEFAULT_ENCODING):
+    """
+    Comprime en memoria la copia de trabajo y prepara su miniatura.
+
+    El tamaño del archivo se estima escalando por el área el de la copia de trabajo.
+
+    :return: Tupla como la de `load_image_preview`, con el tamaño estimado.
+    """
+    image_format = resolve_output_format(input_path, encoding)
+    working, full_size = load_working_copy(input_path, convert_to_grayscale, image_format)
+    task.check_cancelled()
+    data = encode_to_bytes(working, image_format, resize_factor, resize_strategy, **encoding_options(image_format, quality, encoding))
+    task.check_cancelled()
+
+    working_area = working.width * working.height
+    estimated_size_kb = len(data) / 1024 * (full_size[0] * full_size[1]) / working_area
+    width, height = scaled_size(full_size, resize_factor)
+    thumbnail, _, _, image_format = load_image_preview(data)
+    return thumbnail, estimated_size_kb, f"{width}x{height}", image_format
 
 
 
 # Funciones de Visualización
-def show_image(image_path, is_compressed=False, original_size=None):
-    """Muestra una imagen en la interfaz gráfica y muestra información sobre la imagen."""
-    try:
-        with Image.open(image_path) as img:
-            img.thumbnail((200, 200))  # Redimensionar la imagen para que quepa en el Label
-            img_tk = ImageTk.PhotoImage(img)
-            
-            # Tamaño de archivo en KB
-            file_size_kb = os.path.getsize(image_path) / 1024
-            
-            # Dimensiones
+def make_thumbnail(img):
+    """Reduce una imagen ya decodificada al tamaño de miniatura sin copiarla entera."""
+    scale = min(THUMBNAIL_SIZE[0] / img.width, THUMBNAIL_SIZE[1] / img.height, 1.0)
+    return resize_image(img, scaled_size(img.size, scale), 'fast')
+
+def load_image_preview(image, file_size_kb=None):
+    """
+    Prepara la miniatura y los datos de una imagen. No usa Tk, así que puede ejecutarse en segundo plano.
+
+    Los archivos y bytes JPEG se decodifican a escala reducida (Image.thumbnail activa el modo
+    draft de libjpeg), y una imagen ya decodificada se reduce directamente, sin pasar por disco.
+
+    :param image: Ruta del archivo, bytes codificados o imagen de PIL ya decodificada.
+    :param file_size_kb: Tamaño a mostrar cuando `image` es una imagen decodificada.
+    :return: Tupla (miniatura, tamaño en KB, dimensiones, formato).
+    """
+    if isinstance(image, Image.Image):
+        return make_thumbnail(image), file_size_kb, f"{image.width}x{image.height}", image.format
+
+    if isinstance(image, bytes):
+        file_size_kb = len(image) / 1024
+        image = io.BytesIO(image)
+    else:
+        file_size_kb = os.path.getsize(image) / 1024
+    with Image.open(image) as img:
+        dimensions = f"{img.width}x{img.height}"
+        image_format = img.format
+        img.thumbnail(THUMBNAIL_SIZE)  # Redimensionar la imagen para que quepa en el Label
+        return img.copy(), file_size_kb, dimensions, image_format
+
+def load_source_preview(input_path):
+    """
+    Prepara la miniatura de la imagen de origen desde el almacén persistente de miniaturas.
+
+    Solo se lee la cabecera de la imagen; la miniatura se genera la primera vez que se abre
+    la imagen (desde aquí o desde el compresor por lotes) y se guarda en memoria.
+
+    :return: Tupla como la de `load_image_preview`.
+    """
+    def load():
+        with Image.open(input_path) as img:
             dimensions = f"{img.width}x{img.height}"
-            
-            # Formato
             image_format = img.format
+        thumbnail = thumbnail_store.get(input_path, THUMBNAIL_SIZE)
+        return thumbnail, os.path.getsize(input_path) / 1024, dimensions, image_format
+
+    return decoded_cache.get(input_path, 'thumbnail', load)
+
+def display_image_preview(preview, is_compressed=False, original_size=None, estimated=False):
+    """Muestra en la interfaz una miniatura preparada con `load_image_preview` y su información."""
+    thumbnail, file_size_kb, dimensions, image_format = preview
+    img_tk = ImageTk.PhotoImage(thumbnail)
+    image_label, image_info = (compressed_image_label, compressed_image_info) if is_compressed else (original_image_label, original_image_info)
+    image_label.config(image=img_tk)
+    image_label.image = img_tk
+
+    if original_size is not None:
+        # Diferencia en tamaño y porcentaje de compresión (cero si es la propia imagen original)
+        original_size_kb = original_size / 1024
+        size_kb = file_size_kb if is_compressed else original_size_kb
+        size_reduction = original_size_kb - size_kb
+        compression_percentage = (size_reduction / original_size_kb) * 100
+
+        image_info.set(
+            f"Tamaño{' estimado' if estimated else ''}: {size_kb:.2f} KB\n"
+            f"Dimensiones: {dimensions}\n"
+            f"Formato: {image_format}\n"
+            f"Reducción de tamaño: {size_reduction:.2f} KB\n"
+            f"Porcentaje de compresión: {compression_percentage:.2f}%"
+        )
+    else:
+        image_info.set(
+            f"Tamaño: {file_size_kb:.2f} KB\n"
+            f"Dimensiones: {dimensions}\n"
+            f"Formato: {image_format}"
+        )
+
+def show_image(image, is_compressed=False, original_size=None, file_size_kb=None):
+    """Muestra una imagen (ruta, bytes o imagen decodificada) en la interfaz gráfica y muestra información sobre la imagen."""
+    try:
+        if isinstance(image, str) and not is_compressed:
+            preview = load_source_preview(image)
+        else:
+            preview = load_image_preview(image, file_size_kb)
+        display_image_preview(preview, is_compressed, original_size)
+    except Exception as e:
+        print(f"Error al cargar la imagen: {e}")
 
-            if is_compressed:
-                compressed_image_label.config(image=img_tk)
-                compressed_image_label.image = img_tk
-                
-                if original_size is not None:
-                    # Diferencia en tamaño y porcentaje de compresión
-                    compressed_size_kb = file_size_kb
-                    original_size_kb = original_size / 1024
-                    size_reduction = original_size_kb - compressed_size_kb
-                    compression_percentage = (size_reduction / original_size_kb) * 100
-                    
-                    compressed_image_info.set(
-                        f"Tamaño: {compressed_size_kb:.2f} KB\n"
-                        f"Dimensiones: {dimensions}\n"
-                        f"Formato: {image_format}\n"
-                        f"Reducción de tamaño: {size_reduction:.2f} KB\n"
-                        f"Porcentaje de compresión: {compression_percentage:.2f}%"
-                    )
-                else:
-                    compressed_image_info.set(
-                        f"Tamaño: {file_size_kb:.2f} KB\n"
-                        f"Dimensiones: {dimensions}\n"
-                        f"Formato: {image_format}"
-                    )
-            else:
-                original_image_label.config(image=img_tk)
-                original_image_label.image = img_tk
-                
-                if original_size is not None:
-                    # Asumir que la imagen es la original y no comprimida
-                    original_size_kb = original_size / 1024
-                    size_reduction = 0
-                    compression_percentage = 0
-                    
-                    original_image_info.set(
-                        f"Tamaño: {original_size_kb:.2f} KB\n"
-                        f"Dimensiones: {dimensions}\n"
-                        f"Formato: {image_format}\n"
-                        f"Reducción de tamaño: {size_reduction:.2f} KB\n"
-                        f"Porcentaje de compresión: {compression_percentage:.2f}%"
-                    )
-                else:
-                    original_image_info.set(
-                        f"Tamaño: {file_size_kb:.2f} KB\n"
-                        f"Dimensiones: {dimensions}\n"
-                        f"Formato: {image_format}"
-                    )
+
+
+# Funciones de Trabajo en Segundo Plano
+class TaskCancelled(Exception):
+    """El usuario canceló la tarea en segundo plano."""
+
+
+class BackgroundTask:
+    """
+    Trabajo que se ejecuta fuera del hilo de Tk.
+
+    El trabajo recibe la propia tarea para publicar su estado (`status`) y comprobar si se
+    canceló (`check_cancelled`); el resultado se entrega en el hilo de Tk mediante root.after.
+    """
+
+    def __init__(self, work, on_success, status):
+        self.work = work
+        self.on_success = on_success
+        self.status = status
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def check_cancelled(self):
+        """Lanza TaskCancelled si el usuario pulsó Cancelar."""
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+
+
+def set_busy(busy, status=""):
+    """Activa o desactiva las acciones y el indicador de progreso mientras hay una tarea en curso."""
+    for widget in busy_widgets:
+        if busy:
+            # Recordar el estado previo (el usuario puede haber deshabilitado campos)
+            saved_states.setdefault(widget, widget.cget('state'))
+            widget.config(state=tk.DISABLED)
+        elif widget in saved_states:
+            widget.config(state=saved_states.pop(widget))
+    cancel_button.config(state=tk.NORMAL if busy else tk.DISABLED)
+    status_var.set(status)
+    if busy:
+        progress_bar.start(PROGRESS_INTERVAL_MS)
+    else:
+        progress_bar.stop()
+
+def run_in_background(work, on_success, status):
+    """
+    Ejecuta `work(task)` en el hilo de trabajo y llama a `on_success(resultado)` en el hilo de Tk.
+
+    :param work: Función que recibe la BackgroundTask y devuelve el resultado.
+    :param on_success: Función que recibe el resultado en el hilo de Tk.
+    :param status: Texto inicial del indicador de progreso.
+    """
+    global current_task
+    task = BackgroundTask(work, on_success, status)
+    task.future = task_executor.submit(work, task)
+    current_task = task
+    set_busy(True, status)
+    root.after(POLL_INTERVAL_MS, poll_task, task)
+
+def poll_task(task):
+    """Sondea la tarea en curso desde el hilo de Tk y entrega su resultado cuando termina."""
+    global current_task
+    if task is not current_task:
+        return  # La tarea se canceló: su resultado se descarta
+    if not task.future.done():
+        status_var.set(task.status)
+        root.after(POLL_INTERVAL_MS, poll_task, task)
+        return
+
+    current_task = None
+    set_busy(False)
+    try:
+        result = task.future.result()
+    except TaskCancelled:
+        return
     except Exception as e:
-        print(f"Error al cargar la imagen {image_path}: {e}")
+        messagebox.showerror("Error", describe_error(e))
+        return
+    task.on_success(result)
+
+def cancel_task():
+    """Cancela la tarea en curso y devuelve el control a la interfaz de inmediato."""
+    global current_task
+    if current_task is not None:
+        current_task.cancel_event.set()
+        current_task = None
+        set_busy(False, "Cancelado.")
+
+def schedule_live_preview(*_):
+    """Programa la vista previa en vivo tras un cambio de configuración, agrupando los cambios seguidos."""
+    global live_preview_after_id
+    if live_preview_after_id is not None:
+        root.after_cancel(live_preview_after_id)
+        live_preview_after_id = None
+    if live_preview_var.get():
+        live_preview_after_id = root.after(LIVE_PREVIEW_DELAY_MS, start_live_preview)
+
+def skip_live_preview():
+    """Descarta la vista previa en vivo programada o en curso, cuando ya se muestra la vista previa exacta de la configuración."""
+    global live_preview_after_id
+    if live_preview_after_id is not None:
+        root.after_cancel(live_preview_after_id)
+        live_preview_after_id = None
+    cancel_live_preview()
+
+def cancel_live_preview():
+    """Descarta la vista previa en vivo en curso; si aún no empezó, no llega a ejecutarse."""
+    global live_task
+    if live_task is not None:
+        live_task.cancel_event.set()
+        live_task.future.cancel()
+        live_task = None
+
+def start_live_preview():
+    """Lanza la vista previa en vivo con la configuración actual, cancelando la anterior."""
+    global live_preview_after_id, live_task
+    live_preview_after_id = None
+    input_path = input_file_var.get()
+    try:
+        quality = int(quality_var.get())
+        resize_factor = float(resize_var.get())
+    except ValueError:
+        return  # El usuario aún está escribiendo
+    if not os.path.isfile(input_path) or not (1 <= quality <= 100) or not (0 < resize_factor <= 1.0):
+        return
+    convert_to_grayscale = grayscale_var.get() == 's'
+    resize_strategy = resize_strategy_var.get()
+    encoding = read_encoding()
+    original_size = os.path.getsize(input_path)
+
+    cancel_live_preview()
+    task = BackgroundTask(
+        lambda task: render_live_preview(task, input_path, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding),
+        lambda preview: display_image_preview(preview, is_compressed=True, original_size=original_size, estimated=True),
+        "Vista previa en vivo...")
+    task.future = preview_executor.submit(task.work, task)
+    live_task = task
+    root.after(POLL_INTERVAL_MS, poll_live_preview, task)
+
+def poll_live_preview(task):
+    """Entrega la vista previa en vivo solo si sigue siendo la más reciente."""
+    global live_task
+    if task is not live_task:
+        return  # Obsoleta: hay una configuración más reciente
+    if not task.future.done():
+        root.after(POLL_INTERVAL_MS, poll_live_preview, task)
+        return
+
+    live_task = None
+    try:
+        preview = task.future.result()
+    except TaskCancelled:
+        return
+    except Exception as e:
+        status_var.set(describe_error(e))
+        return
+    task.on_success(preview)
 
 
 
 # Funciones de Interfaz Gráfica
+def read_encoding():
+    """Lee el formato de salida y los ajustes de WebP de la interfaz (debe llamarse desde el hilo de Tk)."""
+    image_format = output_format_var.get()
+    try:
+        webp_method = min(max(int(webp_method_var.get()), WEBP_METHODS[0]), WEBP_METHODS[-1])
+    except ValueError:
+        webp_method = DEFAULT_WEBP_METHOD
+    return {'format': None if image_format == ORIGINAL_FORMAT else image_format,
+            'webp_method': webp_method,
+            'lossless': lossless_var.get()}
+
 def browse_folder():
     """Abre un cuadro de diálogo para seleccionar una carpeta y devuelve la ruta seleccionada."""
     folder_selected = filedialog.askdirectory()
@@ -143,14 +504,16 @@ def browse_folder():
 
 def browse_file():
     """Abre un cuadro de diálogo para seleccionar un archivo de imagen y muestra la imagen seleccionada."""
-    file_selected = filedialog.askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png")])
+    file_selected = filedialog.askopenfilename(filetypes=[("Image files", " ".join(f"*{extension}" for extension in supported_extensions()))])
     if file_selected:
         input_file_var.set(file_selected)
-        show_image(file_selected, is_compressed=False)
+        run_in_background(lambda task: load_source_preview(file_selected),
+                          lambda preview: display_image_preview(preview, is_compressed=False),
+                          "Cargando imagen...")
     return file_selected
 
 def apply_preview():
-    """Aplica la compresión y muestra una vista previa de la imagen comprimida."""
+    """Aplica la compresión a resolución completa y muestra una vista previa de la imagen comprimida."""
     input_path = input_file_var.get()
     if not os.path.isfile(input_path):
         messagebox.showerror("Error", "No se ha seleccionado ninguna imagen para previsualizar.")
@@ -182,9 +545,20 @@ def apply_preview():
 
     # Obtener tamaño original de la imagen
     original_size = os.path.getsize(input_path)
+    resize_strategy = resize_strategy_var.get()
+    encoding = read_encoding()
+
+    cancel_live_preview()
 
-    cache_path = compress_and_cache_image(input_path, quality, resize_factor, convert_to_grayscale)
-    show_image(cache_path, is_compressed=True, original_size=original_size)
+    def work(task):
+        cache_path, data = compress_and_cache_image(input_path, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding)
+        last_preview['input_path'] = input_path
+        task.check_cancelled()
+        # Mostrar los bytes recién comprimidos sin volver a leerlos del disco
+        return load_image_preview(data if data is not None else cache_path)
+
+    run_in_background(work, lambda preview: display_image_preview(preview, is_compressed=True, original_size=original_size),
+                      "Comprimiendo vista previa...")
 
 def finalize_compression():
     """Finaliza la compresión y guarda la imagen comprimida en la carpeta de salida especificada."""
@@ -211,12 +585,32 @@ def finalize_compression():
     resize_factor = float(resize_factor) if resize_factor else 1.0
     convert_to_grayscale = convert_to_grayscale == 's'
 
-    compressed_path = get_cache_file_path()
-    if os.path.exists(compressed_path):
-        final_output_path = os.path.join(output_folder, os.path.basename(input_path))
-        compress_image(input_path, final_output_path, quality, resize_factor, convert_to_grayscale)
-        clear_cache()
-        messagebox.showinfo("Finalizado", "Compresión completada y guardada.")
+    if last_preview.get('input_path') == input_path:
+        encoding = read_encoding()
+        image_format = resolve_output_format(input_path, encoding)
+        output_name = os.path.basename(input_path)
+        if encoding['format'] or encoder_for_path(output_name) is None:
+            output_name = os.path.splitext(output_name)[0] + get_encoder(image_format).extension
+        final_output_path = os.path.join(output_folder, output_name)
+        resize_strategy = resize_strategy_var.get()
+
+        def work(task):
+            # Si hay una vista previa generada con esta misma configuración, sus bytes son
+            # exactamente los que se escribirían: se copian en lugar de volver a comprimir
+            params = output_params(input_path, image_format, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding)
+            compressed_path = preview_cache.get(params_hash(params))
+            if compressed_path is not None:
+                if os.path.lexists(final_output_path):
+                    os.remove(final_output_path)
+                shutil.copyfile(compressed_path, final_output_path)
+                print(f"Vista previa reutilizada y guardada: {final_output_path}")
+            else:
+                compress_image(input_path, final_output_path, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding,
+                               image_format)
+            last_preview.clear()
+
+        run_in_background(work, lambda _: messagebox.showinfo("Finalizado", "Compresión completada y guardada."),
+                          "Comprimiendo y guardando...")
     else:
         messagebox.showerror("Error", "No se encontró la imagen comprimida en caché.")
 
@@ -227,7 +621,8 @@ def toggle_entry_fields():
     state = tk.NORMAL if entry_fields_disabled.get() else tk.DISABLED
 
     # Configura el estado de los campos de entrada
-    for widget in [input_file_entry, output_folder_entry, quality_entry, resize_entry, grayscale_entry]:
+    for widget in [input_file_entry, output_folder_entry, quality_entry, resize_entry, resize_strategy_menu, grayscale_entry,
+                   output_format_menu, webp_method_spinbox, lossless_check]:
         widget.config(state=state)
 
     # Configura el estado de los botones
@@ -248,72 +643,471 @@ def find_optimal_compression():
         max_weight_kb = float(max_weight_var.get())
         if max_weight_kb <= 0:
             raise ValueError("El peso máximo debe ser un número positivo.")
-        min_weight_kb = max_weight_kb * 0.8  # Se acepta hasta el 80% del peso máximo deseado como mínimo
     except ValueError as e:
         messagebox.showerror("Error", str(e))
         return
     
     max_attempts = int(attempts_var.get())
-    initial_quality = 100
-    min_quality = 20
-    initial_resize_factor = 1.0
-    min_resize_factor = 0.1
-    quality_decrement = 20
-    resize_decrement = 0.1
-    
-    best_quality = None
-    best_resize_factor = None
-    best_file_size = float('inf')
-    best_compression = None
-
-    attempts = 0
-
-    # Primera fase: Reducción de calidad manteniendo el factor de redimensionamiento en 1.0
-    quality = initial_quality
-    resize_factor = initial_resize_factor
-
-    while attempts < max_attempts and quality >= min_quality:
-        cache_path = compress_and_cache_image(input_path, quality, resize_factor, False)
-        file_size = os.path.getsize(cache_path) / 1024  # Tamaño en KB
-
-        if min_weight_kb <= file_size <= max_weight_kb and file_size < best_file_size:
-            best_file_size = file_size
-            best_quality = quality
-            best_resize_factor = resize_factor
-            best_compression = cache_path
-
-        attempts += 1
-        quality -= quality_decrement
-
-    # Segunda fase: Reducción del factor de redimensionamiento con la calidad mínima alcanzada
-    quality = min_quality
-    while attempts < max_attempts and resize_factor >= min_resize_factor:
-        cache_path = compress_and_cache_image(input_path, quality, resize_factor, False)
-        file_size = os.path.getsize(cache_path) / 1024  # Tamaño en KB
-
-        if min_weight_kb <= file_size <= max_weight_kb and file_size < best_file_size:
-            best_file_size = file_size
-            best_quality = quality
-            best_resize_factor = resize_factor
-            best_compression = cache_path
-
-        attempts += 1
-        resize_factor -= resize_decrement
-        print(max_attempts, attempts, resize_factor, min_resize_factor)
-
-    if best_compression:
-        messagebox.showinfo("Óptimo Encontrado",
-            f"La mejor configuración encontrada:\n"
-            f"Calidad: {best_quality}\n"
-            f"Factor de Reducción: {best_resize_factor}\n"
-            f"Tamaño: {best_file_size:.2f} KB")
-        
-        quality_var.set(value=best_quality)
-        resize_var.set(value=best_resize_factor)
-        apply_preview()
-    else:
-        messagebox.showinfo("Óptimo Encontrado", "No se encontró una configuración que cumpla con el peso deseado.")
+    resize_strategy = resize_strategy_var.get()
+    convert_to_grayscale = grayscale_var.get() == 's'
+    encoding = read_encoding()
+    image_format = resolve_output_format(input_path, encoding)
+    original_size = os.path.getsize(input_path)
+
+    def work(task):
+        # Decodificar una sola vez y medir los candidatos codificándolos en memoria
+        source, full_size = load_source_image(input_path, convert_to_grayscale, image_format)
+        encoded = {}
+
+        def probe_key(quality, resize_factor):
+            return params_hash(output_params(input_path, image_format, quality, resize_factor, convert_to_grayscale, resize_strategy, encoding))
+
+        def encode(image, quality, resize_factor=1.0):
+            return encode_to_bytes(image, image_format, resize_factor, resize_strategy, **encoding_options(image_format, quality, encoding))
+
+        def probe(quality, resize_factor):
+            # Cada candidato se guarda en la caché de vistas previas con su propia clave
+            task.check_cancelled()
+            # Misma decodificación que usaría compress_image con este factor, para que los bytes coincidan
+            scaled, _ = load_source_image(input_path, convert_to_grayscale, image_format, draft_scale(resize_factor))
+            data = encode_to_bytes(scaled, image_format, resize_strategy=resize_strategy, target_size=scaled_size(full_size, resize_factor),
+                                   **encoding_options(image_format, quality, encoding))
+            preview_cache.store(probe_key(quality, resize_factor), data, get_encoder(image_format).extension)
+            encoded[(quality, resize_factor)] = data
+            task.status = f"Buscando configuración óptima... {len(encoded)} codificaciones"
+            return len(data) / 1024  # Tamaño en KB
+
+        # Bisección de la calidad y, si no basta, del factor de redimensionamiento, evaluando varios
+        # candidatos por ronda en paralelo. En los formatos con calidad se estima antes el tamaño con
+        # un proxy reducido para empezar cerca de la solución; en el resto (PNG, WebP sin pérdida)
+        # solo se busca el factor
+        if get_encoder(image_format).has_quality(encoding):
+            model = build_size_model(source, encode)
+            best, attempts = find_target_compression(probe, max_weight_kb, max_attempts, model, search_executor, SEARCH_PARALLELISM)
+        else:
+            best, attempts = find_target_compression(probe, max_weight_kb, max_attempts, None, search_executor, SEARCH_PARALLELISM,
+                                                     min_quality=MAX_QUALITY)
+        print(f"Búsqueda automática: {attempts} codificaciones")
+        task.check_cancelled()
+        if not best:
+            return None, None
+
+        # La codificación ganadora ya está en la caché de vistas previas; se muestra desde memoria
+        last_preview['input_path'] = input_path
+        return best, load_image_preview(encoded[best[:2]])
+
+    def on_success(result):
+        best, preview = result
+        if best:
+            best_quality, best_resize_factor, best_file_size = best
+            quality_var.set(value=best_quality)
+            resize_var.set(value=best_resize_factor)
+            skip_live_preview()  # La estimación de la copia de trabajo sustituiría al resultado exacto
+            display_image_preview(preview, is_compressed=True, original_size=original_size)
+            messagebox.showinfo("Óptimo Encontrado",
+                f"La mejor configuración encontrada:\n"
+                f"Calidad: {best_quality}\n"
+                f"Factor de Reducción: {best_resize_factor}\n"
+                f"Tamaño: {best_file_size:.2f} KB")
+        else:
+            messagebox.showinfo("Óptimo Encontrado", "No se encontró una configuración que cumpla con el peso deseado.")
+
+    run_in_background(work, on_success, "Buscando configuración óptima...")
+
+def find_perceptual_compression():
+    """Busca la calidad más baja que alcanza el SSIM objetivo con el factor de reducción actual."""
+    input_path = input_file_var.get()
+    if not os.path.isfile(input_path):
+        messagebox.showerror("Error", "No se ha seleccionado ninguna imagen para comprimir.")
+        return
+    if not numpy_available():
+        messagebox.showerror("Error", "La búsqueda perceptual necesita NumPy (pip install numpy).")
+        return
+
+    try:
+        target_ssim = float(target_ssim_var.get())
+        if not 0 < target_ssim < 1:
+            raise ValueError("El SSIM objetivo debe estar entre 0 y 1.")
+        resize_factor = float(resize_var.get()) if resize_var.get() else 1.0
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        return
+
+    max_attempts = int(attempts_var.get())
+    resize_strategy = resize_strategy_var.get()
+    convert_to_grayscale = grayscale_var.get() == 's'
+    encoding = read_encoding()
+    image_format = resolve_output_format(input_path, encoding)
+    if not get_encoder(image_format).has_quality(encoding):
+        messagebox.showerror("Error", f"El formato {image_format} no tiene una calidad que ajustar.")
+        return
+    original_size = os.path.getsize(input_path)
+
+    def work(task):
+        # Redimensionar una sola vez y comparar cada candidato con la misma luminancia de referencia
+        source, full_size = load_source_image(input_path, convert_to_grayscale, image_format, draft_scale(resize_factor))
+        target_size = scaled_size(full_size, resize_factor)
+        resized = resize_image(source, target_size, resize_strategy) if source.size != target_size else source
+        reference = luma(resized)
+        encoded = {}
+
+        def probe(quality):
+            # Los bytes son los mismos que escribiría compress_image: se guardan en la caché de vistas previas
+            task.check_cancelled()
+            data = encode_to_bytes(resized, image_format, **encoding_options(image_format, quality, encoding))
+            preview_cache.store(params_hash(output_params(input_path, image_format, quality, resize_factor, convert_to_grayscale,
+                                                          resize_strategy, encoding)),
+                                data, get_encoder(image_format).extension)
+            encoded[quality] = data
+            task.status = f"Buscando calidad perceptual... {len(encoded)} codificaciones"
+            return ssim(reference, decoded_luma(data))
+
+        best, attempts = find_quality_for_ssim(probe, target_ssim, max_attempts, search_executor, SEARCH_PARALLELISM)
+        print(f"Búsqueda perceptual: {attempts} codificaciones")
+        task.check_cancelled()
+        if not best:
+            return None, None
+
+        last_preview['input_path'] = input_path
+        return best + (len(encoded[best[0]]) / 1024,), load_image_preview(encoded[best[0]])
+
+    def on_success(result):
+        best, preview = result
+        if best:
+            best_quality, best_ssim, best_file_size = best
+            quality_var.set(value=best_quality)
+            skip_live_preview()  # La estimación de la copia de trabajo sustituiría al resultado exacto
+            display_image_preview(preview, is_compressed=True, original_size=original_size)
+            messagebox.showinfo("Calidad Perceptual",
+                f"La calidad más baja que alcanza el SSIM objetivo:\n"
+                f"Calidad: {best_quality}\n"
+                f"SSIM: {best_ssim:.4f}\n"
+                f"Tamaño: {best_file_size:.2f} KB")
+        else:
+            messagebox.showinfo("Calidad Perceptual", "Ninguna calidad probada alcanza el SSIM objetivo.")
+
+    run_in_background(work, on_success, "Buscando calidad perceptual...")
+
+
+
+
+# Modo Carpeta
+class ThumbnailGrid:
+    """
+    Cuadrícula de miniaturas virtualizada para carpetas con miles de imágenes.
+
+    Solo se dibujan las celdas de las filas visibles; las miniaturas se obtienen del almacén
+    persistente (o se generan) en un grupo de hilos únicamente para esas celdas, y las
+    peticiones que dejan de ser visibles antes de empezar se descartan. Las miniaturas se conservan en memoria con un límite (LRU) y los
+    PhotoImage de Tk solo existen mientras su celda está en pantalla.
+    """
+
+    def __init__(self, parent, on_selection_change):
+        self.on_selection_change = on_selection_change
+        self.canvas = tk.Canvas(parent, bg='white', highlightthickness=0, yscrollincrement=GRID_CELL_HEIGHT // 4)
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.config(yscrollcommand=self._on_scroll)
+        self.files = []
+        self.selected = set()
+        self.columns = 1
+        self.visible = range(0)
+        self.cells = {}  # Índice -> identificadores de los elementos del Canvas
+        self.photos = {}  # Índice -> PhotoImage de las celdas visibles
+        self.thumbnails = OrderedDict()  # Índice -> miniatura de PIL (LRU)
+        self.pending = set()
+        self.failed = set()
+        self.generation = 0  # Listado al que pertenecen las miniaturas pedidas, ya que los índices se reutilizan
+        self.results = queue.SimpleQueue()
+        self.executor = ThreadPoolExecutor(max_workers=GRID_THUMBNAIL_WORKERS)
+        self.closed = False
+
+        self.canvas.bind('<Configure>', self.relayout)
+        self.canvas.bind('<Button-1>', self._on_click)
+        self.canvas.bind('<MouseWheel>', lambda event: self.canvas.yview_scroll(-1 if event.delta > 0 else 1, 'units'))
+        self.canvas.bind('<Button-4>', lambda event: self.canvas.yview_scroll(-1, 'units'))
+        self.canvas.bind('<Button-5>', lambda event: self.canvas.yview_scroll(1, 'units'))
+        self._poll()
+
+    def set_files(self, files):
+        """Sustituye la lista de imágenes mostradas."""
+        self.files = []
+        self.generation += 1
+        self.selected.clear()
+        self.thumbnails.clear()
+        self.pending.clear()
+        self.failed.clear()
+        self.add_files(files)
+        self.canvas.yview_moveto(0)
+
+    def add_files(self, files):
+        """Añade imágenes al final de la cuadrícula (el listado de la carpeta llega por partes)."""
+        self.files.extend(files)
+        self._update_scrollregion()
+        self.refresh()
+
+    def selected_files(self):
+        """Devuelve las rutas seleccionadas en el orden de la cuadrícula."""
+        return [self.files[index] for index in sorted(self.selected)]
+
+    def select_all(self, selected=True):
+        """Selecciona o deselecciona todas las imágenes."""
+        self.selected = set(range(len(self.files))) if selected else set()
+        for index in self.cells:
+            self._update_outline(index)
+        self.on_selection_change()
+
+    def relayout(self, event=None):
+        """Recalcula las columnas según el ancho disponible y vuelve a dibujar las celdas visibles."""
+        columns = max(1, self.canvas.winfo_width() // GRID_CELL_WIDTH)
+        if columns != self.columns:
+            self.columns = columns
+            self._clear_cells()
+            self._update_scrollregion()
+        self.refresh()
+
+    def refresh(self):
+        """Dibuja las celdas de las filas visibles, elimina las demás y pide sus miniaturas."""
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(0, int(top // GRID_CELL_HEIGHT))
+        last_row = int(bottom // GRID_CELL_HEIGHT)
+        self.visible = range(first_row * self.columns, min(len(self.files), (last_row + 1) * self.columns))
+
+        for index in [index for index in self.cells if index not in self.visible]:
+            for item in self.cells.pop(index):
+                self.canvas.delete(item)
+            self.photos.pop(index, None)
+        for index in self.visible:
+            if index not in self.cells:
+                self._draw_cell(index)
+
+    def close(self):
+        """Detiene la generación de miniaturas."""
+        self.closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def _update_scrollregion(self):
+        rows = -(-len(self.files) // self.columns)
+        self.canvas.config(scrollregion=(0, 0, self.columns * GRID_CELL_WIDTH, rows * GRID_CELL_HEIGHT))
+
+    def _clear_cells(self):
+        self.canvas.delete('all')
+        self.cells.clear()
+        self.photos.clear()
+
+    def _cell_origin(self, index):
+        row, column = divmod(index, self.columns)
+        return column * GRID_CELL_WIDTH, row * GRID_CELL_HEIGHT
+
+    def _draw_cell(self, index):
+        x, y = self._cell_origin(index)
+        outline = self.canvas.create_rectangle(x + 2, y + 2, x + GRID_CELL_WIDTH - 2, y + GRID_CELL_HEIGHT - 2, outline='', width=3)
+        center_x = x + GRID_CELL_WIDTH // 2
+        image = self.canvas.create_image(center_x, y + 8 + GRID_THUMBNAIL_SIZE[1] // 2)
+        name = os.path.basename(self.files[index])
+        if len(name) > GRID_NAME_LENGTH:
+            name = name[:GRID_NAME_LENGTH - 1] + '…'
+        label = self.canvas.create_text(center_x, y + GRID_CELL_HEIGHT - 16, text=name)
+        self.cells[index] = (outline, image, label)
+        self._update_outline(index)
+
+        if index in self.thumbnails:
+            self.thumbnails.move_to_end(index)
+            self._show_thumbnail(index)
+        elif index in self.failed:
+            self.canvas.itemconfig(label, text=f"{name} (?)")
+        elif index not in self.pending:
+            self.pending.add(index)
+            self.executor.submit(self._load, self.generation, index, self.files[index])
+
+    def _load(self, generation, index, path):
+        # Se ejecuta en el grupo de hilos: las peticiones que ya no están en pantalla se descartan
+        if self.closed or generation != self.generation or index not in self.visible:
+            self.results.put((generation, index, None, False))
+            return
+        try:
+            self.results.put((generation, index, thumbnail_store.get(path, GRID_THUMBNAIL_SIZE), False))
+        except Exception as e:
+            print(f"Error al generar la miniatura de {path}: {e}")
+            self.results.put((generation, index, None, True))
+
+    def _poll(self):
+        if self.closed:
+            return
+        while not self.results.empty():
+            generation, index, thumbnail, failed = self.results.get()
+            if generation != self.generation:
+                continue  # Miniatura de un listado anterior: el índice ya es de otra imagen
+            self.pending.discard(index)
+            if failed:
+                self.failed.add(index)
+            elif thumbnail is not None:
+                self.thumbnails[index] = thumbnail
+                while len(self.thumbnails) > GRID_THUMBNAIL_MEMORY_ITEMS:
+                    self.thumbnails.popitem(last=False)
+            if index in self.cells:
+                # Celda todavía visible: mostrar la miniatura o volver a pedirla si se descartó
+                for item in self.cells.pop(index):
+                    self.canvas.delete(item)
+                self._draw_cell(index)
+        self.canvas.after(POLL_INTERVAL_MS, self._poll)
+
+    def _show_thumbnail(self, index):
+        photo = ImageTk.PhotoImage(self.thumbnails[index])
+        self.photos[index] = photo
+        self.canvas.itemconfig(self.cells[index][1], image=photo)
+
+    def _update_outline(self, index):
+        self.canvas.itemconfig(self.cells[index][0], outline='#3a7bd5' if index in self.selected else '')
+
+    def _on_click(self, event):
+        column = int(self.canvas.canvasx(event.x) // GRID_CELL_WIDTH)
+        index = int(self.canvas.canvasy(event.y) // GRID_CELL_HEIGHT) * self.columns + column
+        if column >= self.columns or index >= len(self.files):
+            return
+        self.selected.symmetric_difference_update({index})
+        if index in self.cells:
+            self._update_outline(index)
+        self.on_selection_change()
+
+
+def open_folder_mode():
+    """Abre la ventana del modo carpeta: cuadrícula de miniaturas y compresión por lotes de la selección."""
+    window = tk.Toplevel(root)
+    window.title("Modo Carpeta")
+    window.geometry("900x650")
+
+    folder_var = tk.StringVar()
+    recursive_var = tk.BooleanVar(value=False)
+    summary_var = tk.StringVar(value="Seleccione una carpeta.")
+    listing = {'generation': 0, 'folder': None}  # Carpeta del último listado, de la que se comprime la selección
+
+    toolbar = tk.Frame(window)
+    toolbar.pack(fill=tk.X, padx=10, pady=5)
+    grid_frame = tk.Frame(window)
+    grid_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    def update_summary():
+        summary_var.set(f"{len(grid.files)} imágenes, {len(grid.selected)} seleccionadas")
+
+    grid = ThumbnailGrid(grid_frame, update_summary)
+    grid.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    grid.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    def list_folder(folder, recursive, generation, batches):
+        # Se ejecuta en segundo plano: el listado llega a la cuadrícula por partes
+        batch = []
+        for path in iter_image_files(folder, supported_extensions(), recursive):
+            if listing['generation'] != generation:
+                return
+            batch.append(path)
+            if len(batch) >= GRID_LISTING_BATCH:
+                batches.put(batch)
+                batch = []
+        batches.put(batch)
+        batches.put(None)
+
+    def poll_listing(generation, batches):
+        if listing['generation'] != generation or not window.winfo_exists():
+            return
+        while not batches.empty():
+            batch = batches.get()
+            if batch is None:
+                update_summary()
+                return
+            grid.add_files(sorted(batch))
+        update_summary()
+        window.after(POLL_INTERVAL_MS, poll_listing, generation, batches)
+
+    def load_folder():
+        folder = folder_var.get()
+        if not validate_folder_path(folder):
+            messagebox.showerror("Error", "La carpeta de origen no es válida.", parent=window)
+            return
+        listing['generation'] += 1
+        listing['folder'] = folder
+        batches = queue.SimpleQueue()
+        grid.set_files([])
+        threading.Thread(target=list_folder, args=(folder, recursive_var.get(), listing['generation'], batches), daemon=True).start()
+        poll_listing(listing['generation'], batches)
+
+    def choose_folder():
+        folder = browse_folder()
+        if folder:
+            folder_var.set(folder)
+            load_folder()
+
+    def compress_selection():
+        files = grid.selected_files()
+        folder = listing['folder']
+        output_folder = output_folder_var.get()
+        if not files:
+            messagebox.showerror("Error", "No se ha seleccionado ninguna imagen.", parent=window)
+            return
+        if not validate_output_path(output_folder, CARPETAS_A_VERIFICAR) or not validate_folder_path(output_folder):
+            messagebox.showerror("Error", "La carpeta de salida no es válida.", parent=window)
+            return
+        quality = validate_quality(quality_var.get()) or 85
+        try:
+            resize_factor = float(resize_var.get() or 1.0)
+        except ValueError:
+            messagebox.showerror("Error", "El factor de reducción debe ser un número.", parent=window)
+            return
+        convert_to_grayscale = grayscale_var.get() == 's'
+        resize_strategy = resize_strategy_var.get()
+        encoding = read_encoding()
+
+        def work(task):
+            done = []
+            failed = []
+
+            def on_result(file, status):
+                (done if status == STATUS_OK else failed).append(file)
+                task.status = f"Comprimidas {len(done)} de {len(files)} imágenes..."
+                task.check_cancelled()
+
+            # El motor por lotes usa hilos: Pillow libera el GIL al codificar y no se bifurca el proceso de Tk
+            compress_images_in_folder(folder, output_folder, quality, encoding['format'], resize_factor, convert_to_grayscale,
+                                      backend='threads', resize_strategy=resize_strategy, files=files, on_result=on_result,
+                                      webp_method=encoding['webp_method'], lossless=encoding['lossless'])
+            return len(done), len(failed)
+
+        def on_success(result):
+            done, failed = result
+            if failed:
+                messagebox.showwarning("Finalizado", f"{done} imágenes comprimidas y guardadas.\n"
+                                                     f"{failed} no se pudieron comprimir (ver detalles en la consola).", parent=window)
+            else:
+                messagebox.showinfo("Finalizado", f"{done} imágenes comprimidas y guardadas.", parent=window)
+
+        run_in_background(work, on_success, "Comprimiendo selección...")
+
+    def close():
+        listing['generation'] += 1
+        grid.close()
+        busy_widgets.remove(compress_selection_button)
+        saved_states.pop(compress_selection_button, None)
+        window.destroy()
 
+    tk.Label(toolbar, text="Carpeta:").pack(side=tk.LEFT)
+    tk.Entry(toolbar, textvariable=folder_var, width=40).pack(side=tk.LEFT, padx=5)
+    tk.Button(toolbar, text="Buscar Carpeta", command=choose_folder).pack(side=tk.LEFT)
+    tk.Checkbutton(toolbar, text="Subcarpetas", variable=recursive_var, command=load_folder).pack(side=tk.LEFT, padx=5)
+    tk.Button(toolbar, text="Todas", command=lambda: grid.select_all(True)).pack(side=tk.LEFT)
+    tk.Button(toolbar, text="Ninguna", command=lambda: grid.select_all(False)).pack(side=tk.LEFT)
+    compress_selection_button = tk.Button(toolbar, text="Comprimir Selección", command=compress_selection)
+    compress_selection_button.pack(side=tk.LEFT, padx=5)
+    tk.Label(toolbar, textvariable=summary_var).pack(side=tk.LEFT, padx=5)
+
+    # La compresión usa la configuración y la carpeta de salida de la ventana principal
+    busy_widgets.append(compress_selection_button)
+    if current_task is not None:
+        compress_selection_button.config(state=tk.DISABLED)
+    window.protocol("WM_DELETE_WINDOW", close)
 
 
 
@@ -329,6 +1123,7 @@ resize_var = tk.StringVar(value="1.0")
 grayscale_var = tk.StringVar(value="n")
 entry_fields_disabled = tk.BooleanVar(value=False)
 max_weight_var = tk.StringVar(value="100")  # Peso máximo en KB
+resize_strategy_var = tk.StringVar(value=DEFAULT_RESIZE_STRATEGY)  # Compromiso calidad/velocidad del redimensionado
 
 # Layout de la GUI
 tk.Label(root, text="CONFIGURACIONES:").grid(row=0, column=0, padx=10, pady=5)
@@ -362,20 +1157,48 @@ tk.Label(root, text="Calidad (1 - 100):").grid(row=3, column=0, padx=10, pady=5)
 quality_entry = tk.Entry(root, textvariable=quality_var, width=10)
 quality_entry.grid(row=3, column=1, padx=10, pady=5)
 tk.Label(root, text="|").grid(row=3, column=3, padx=10, pady=5)
-tk.Button(root, text="Busqueda Automática", command=find_optimal_compression).grid(row=3, column=4, columnspan=3, padx=10, pady=5)
+search_button = tk.Button(root, text="Busqueda Automática", command=find_optimal_compression)
+search_button.grid(row=3, column=4, columnspan=3, padx=10, pady=5)
+
+# Formato de salida y ajustes de WebP (esfuerzo del codificador 0-6 y modo sin pérdida)
+output_format_var = tk.StringVar(value=ORIGINAL_FORMAT)
+webp_method_var = tk.StringVar(value=str(DEFAULT_WEBP_METHOD))
+lossless_var = tk.BooleanVar(value=False)
+format_frame = tk.Frame(root)
+format_frame.grid(row=3, column=2, padx=10, pady=5)
+output_format_menu = tk.OptionMenu(format_frame, output_format_var, ORIGINAL_FORMAT, *output_formats())
+output_format_menu.pack(side=tk.LEFT)
+tk.Label(format_frame, text="Esfuerzo WebP:").pack(side=tk.LEFT)
+webp_method_spinbox = tk.Spinbox(format_frame, from_=WEBP_METHODS[0], to=WEBP_METHODS[-1], textvariable=webp_method_var, width=3)
+webp_method_spinbox.pack(side=tk.LEFT)
+lossless_check = tk.Checkbutton(format_frame, text="Sin pérdida", variable=lossless_var)
+lossless_check.pack(side=tk.LEFT)
 
 
 tk.Label(root, text="Factor de Reducción (0.1 - 1.0):").grid(row=4, column=0, padx=10, pady=5)
 resize_entry = tk.Entry(root, textvariable=resize_var, width=10)
 resize_entry.grid(row=4, column=1, padx=10, pady=5)
+resize_strategy_menu = tk.OptionMenu(root, resize_strategy_var, *RESIZE_STRATEGIES)
+resize_strategy_menu.grid(row=4, column=2, padx=10, pady=5)
 tk.Label(root, text="|").grid(row=4, column=3, padx=10, pady=5)
+perceptual_button = tk.Button(root, text="Búsqueda Perceptual", command=find_perceptual_compression)
+perceptual_button.grid(row=4, column=4, padx=10, pady=5)
 
 
 tk.Label(root, text="Grayscale (s/n):").grid(row=5, column=0, padx=10, pady=5)
 grayscale_entry = tk.Entry(root, textvariable=grayscale_var, width=10)
 grayscale_entry.grid(row=5, column=1, padx=10, pady=5)
+live_preview_var = tk.BooleanVar(value=True)
+tk.Checkbutton(root, text="Vista previa en vivo", variable=live_preview_var, command=schedule_live_preview).grid(row=5, column=2, padx=10, pady=5)
 tk.Label(root, text="|").grid(row=5, column=3, padx=10, pady=5)
 
+# SSIM objetivo de la búsqueda perceptual
+target_ssim_var = tk.StringVar(value=str(DEFAULT_TARGET_SSIM))
+target_ssim_frame = tk.Frame(root)
+target_ssim_frame.grid(row=5, column=4, padx=10, pady=5)
+tk.Label(target_ssim_frame, text="SSIM objetivo:").pack(side=tk.LEFT)
+tk.Entry(target_ssim_frame, textvariable=target_ssim_var, width=6).pack(side=tk.LEFT)
+
 
 tk.Label(root, text="Peso Máximo (KB)").grid(row=6, column=0, padx=10, pady=5)
 tk.Entry(root, textvariable=max_weight_var, width=10).grid(row=6, column=1, padx=10, pady=5)
@@ -406,11 +1229,42 @@ tk.Label(root, textvariable=compressed_image_info).grid(row=8, column=1,  pady=5
 # Botón para habilitar/deshabilitar campos
 toggle_button = tk.Button(root, text="Habilitar/Deshabilitar Campos", command=toggle_entry_fields)
 toggle_button.grid(row=9, column=0, columnspan=4, pady=10)
+tk.Button(root, text="Modo Carpeta", command=open_folder_mode).grid(row=9, column=4, pady=10)
+
+
+# Indicador de progreso y cancelación de las tareas en segundo plano
+status_var = tk.StringVar()
+progress_bar = ttk.Progressbar(root, mode='indeterminate', length=200)
+progress_bar.grid(row=10, column=0, padx=10, pady=5)
+tk.Label(root, textvariable=status_var).grid(row=10, column=1, columnspan=2, padx=10, pady=5)
+cancel_button = tk.Button(root, text="Cancelar", command=cancel_task, state=tk.DISABLED)
+cancel_button.grid(row=10, column=4, pady=5)
 
 
 
 # Crear la carpeta de caché al iniciar
 create_cache_folder()
+clear_cache()
+preview_cache = PreviewCache(CACHE_DIR, PREVIEW_CACHE_MAX_BYTES)
+atexit.register(preview_cache.close)  # Las vistas previas solo viven durante la sesión
+thumbnail_store = ThumbnailStore(THUMBNAIL_STORE_DIR, THUMBNAIL_STORE_MAX_BYTES)
+atexit.register(thumbnail_store.evict)
+content_cache = ContentCache(CONTENT_CACHE_DIR, CONTENT_CACHE_MAX_BYTES)
+atexit.register(content_cache.evict)  # Una sesión corta no llega a la expulsión periódica de note_stores
+decoded_cache = DecodedImageCache(DECODED_CACHE_MAX_BYTES)
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_PARALLELISM)
+task_executor = ThreadPoolExecutor(max_workers=1)  # Hilo de trabajo de la interfaz
+current_task = None
+last_preview = {}  # Imagen de la última vista previa a resolución completa
+saved_states = {}  # Estado de los botones antes de la tarea en curso
+busy_widgets = [preview_button, compress_button, search_button, perceptual_button, browse_button]  # Acciones desactivadas durante una tarea
+
+# Vista previa en vivo: se recalcula al cambiar la configuración, en su propio hilo
+preview_executor = ThreadPoolExecutor(max_workers=1)
+live_task = None
+live_preview_after_id = None
+for variable in [input_file_var, quality_var, resize_var, grayscale_var, resize_strategy_var, output_format_var, webp_method_var, lossless_var]:
+    variable.trace_add('write', schedule_live_preview)
 
 
 root.mainloop()
\ No newline at end of file
@@ -1,7 +1,37 @@
+import io
 import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from functionalities.validations import validate_folder_path, validate_quality, validate_output_format
+from functionalities.executors import BACKENDS, HybridExecutor, create_executor, default_backend, default_workers
+from functionalities.walker import iter_image_files
+from functionalities.scheduler import default_max_in_flight, run_bounded
+from functionalities.imaging import (DEFAULT_RESIZE_STRATEGY, RESIZE_STRATEGIES, draft_for_size, encode_to_bytes, estimate_decoded_bytes,
+                                     psnr, resize_image, scaled_size)
+from functionalities.encoders import DEFAULT_WEBP_METHOD, WEBP_METHODS, encoder_for_path, get_encoder, output_formats, supported_extensions
+from functionalities.size_search import MAX_QUALITY, build_size_model, find_target_compression
+from functionalities.manifest import BatchManifest, file_signature, params_hash
+from functionalities.content_cache import ContentCache, hash_bytes, hash_file
+from functionalities.perceptual import DEFAULT_TARGET_SSIM, decoded_luma, find_quality_for_ssim, luma, require_numpy, ssim
+from functionalities.thumbnail_store import DEFAULT_STORE_DIR, DEFAULT_STORE_SIZE, DEFAULT_THUMBNAIL_SIZES, ThumbnailStore
+
+# Tamaño máximo por defecto de la caché por contenido (1 GB)
+DEFAULT_CONTENT_CACHE_SIZE = 1024 * 1024 * 1024
+# Rondas de codificación por imagen en el modo de peso máximo
+TARGET_MAX_ATTEMPTS = 12
+
+# Extensiones de las imágenes de origen que se procesan: las de los formatos registrados
+SUPPORTED_FORMATS = supported_extensions()
+
+# Modo de mejor formato: candidatos por defecto y fidelidad mínima (PSNR en dB) que debe tener la salida
+DEFAULT_BEST_FORMATS = ('JPEG', 'WEBP', 'PNG8')
+DEFAULT_MIN_PSNR = 32.0
+
+# Resultado de cada tarea de compresión
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_UNREACHABLE = 'unreachable'
 
 def get_validated_input(prompt, valid_options=None, default=None, validate_func=None):
     """
@@ -27,76 +57,554 @@ def get_validated_input(prompt, valid_options=None, default=None, validate_func=
         else:
             return user_input
 
-def compress_image(input_path, output_path, quality=85, output_format=None, resize_factor=1.0, convert_to_grayscale=False):
+def compression_params(quality=85, output_format=None, resize_factor=1.0, convert_to_grayscale=False,
+                       resize_strategy=DEFAULT_RESIZE_STRATEGY, max_kb=None, webp_method=DEFAULT_WEBP_METHOD, lossless=False,
+                       best_formats=None, min_psnr=DEFAULT_MIN_PSNR, target_ssim=None):
     """
-    Comprime una imagen para reducir su tamaño manteniendo la calidad.
+    Agrupa los parámetros que determinan el resultado de la compresión.
+
+    :param max_kb: Peso máximo por imagen en KB; si se indica, la calidad y el factor se buscan por imagen.
+    :param webp_method: Esfuerzo del codificador WebP (0 rápido - 6 archivos más pequeños).
+    :param lossless: Si es True, WebP se codifica sin pérdida.
+    :param best_formats: Formatos candidatos; si se indican, cada imagen se guarda en el que ocupa menos.
+    :param min_psnr: Fidelidad mínima (PSNR en dB) de un candidato para poder elegirlo.
+    :param target_ssim: SSIM objetivo; si se indica, la calidad se busca por imagen.
+    :return: Diccionario que reciben las tareas y con el que se calculan las claves del manifiesto y de la caché.
+    """
+    return {'quality': quality, 'output_format': output_format, 'resize_factor': resize_factor,
+            'convert_to_grayscale': convert_to_grayscale, 'resize_strategy': resize_strategy, 'max_kb': max_kb,
+            'webp_method': webp_method, 'lossless': lossless,
+            'best_formats': list(best_formats) if best_formats else None, 'min_psnr': min_psnr, 'target_ssim': target_ssim}
+
+
+class TargetSizeNotReached(Exception):
+    """La imagen no cabe en el peso máximo ni con la calidad y el factor de reducción mínimos."""
+
+
+def _convert_for_format(img, image_format, convert_to_grayscale):
+    """
+    Convierte el modo de la imagen según el formato de salida.
+
+    :return: Imagen convertida (o la misma si no hace falta).
+    """
+    if convert_to_grayscale:
+        return img.convert('L')
+    encoder = get_encoder(image_format)
+    if encoder is not None:
+        return encoder.convert(img)
+    return img.convert('RGB')
+
+def _search_target_size(img, image_format, params):
+    """
+    Busca por imagen la calidad y el factor de reducción que respetan el peso máximo, codificando en memoria.
+
+    :param img: Imagen ya convertida.
+    :param image_format: Formato de salida registrado.
+    :param params: Parámetros de compresión con `max_kb`; sirven también de ajustes del codificador.
+    :return: Tupla (bytes codificados, (calidad, factor, tamaño_kb)).
+    :raises TargetSizeNotReached: Si ningún candidato cabe en el peso máximo.
+    """
+    img.load()
+    encoder = get_encoder(image_format)
+
+    def encode(image, quality, resize_factor=1.0):
+        return encode_to_bytes(image, image_format, resize_factor, params['resize_strategy'], **encoder.options(quality, params))
+
+    encoded = {}
+
+    def probe(quality, resize_factor):
+        encoded[(quality, resize_factor)] = encode(img, quality, resize_factor)
+        return len(encoded[(quality, resize_factor)]) / 1024
+
+    # En los formatos con calidad se siembra la búsqueda con el modelo; en el resto solo se busca el factor
+    if encoder.has_quality(params):
+        best, _ = find_target_compression(probe, params['max_kb'], TARGET_MAX_ATTEMPTS, build_size_model(img, encode))
+    else:
+        best, _ = find_target_compression(probe, params['max_kb'], TARGET_MAX_ATTEMPTS, min_quality=MAX_QUALITY)
+    if best is None:
+        raise TargetSizeNotReached(f"no cabe en {params['max_kb']} KB")
+    return encoded[best[:2]], best
+
+def _search_target_ssim(img, original_format, image_format, params):
+    """
+    Busca por imagen la calidad más baja que alcanza el SSIM objetivo, codificando en memoria.
+
+    La imagen se convierte y redimensiona una sola vez y su luminancia de referencia se
+    reutiliza en todas las codificaciones.
+
+    :param img: Imagen abierta con PIL.
+    :param original_format: Formato con el que se convierte la imagen.
+    :param image_format: Formato de salida registrado, con calidad que ajustar.
+    :param params: Parámetros de compresión con `target_ssim`.
+    :return: Tupla (bytes codificados, (calidad, factor, tamaño_kb, SSIM)).
+    """
+    target_size = scaled_size(img.size, params['resize_factor'])
+    if params['resize_factor'] < 1.0:
+        draft_for_size(img, target_size, params['convert_to_grayscale'])
+    img = _convert_for_format(img, original_format, params['convert_to_grayscale'])
+    if img.size != target_size:
+        img = resize_image(img, target_size, params['resize_strategy'])
+    img.load()
+    encoder = get_encoder(image_format)
+    reference = luma(img)
+    encoded = {}
+
+    def probe(quality):
+        encoded[quality] = encode_to_bytes(img, image_format, **encoder.options(quality, params))
+        return ssim(reference, decoded_luma(encoded[quality]))
+
+    best, _ = find_quality_for_ssim(probe, params['target_ssim'], TARGET_MAX_ATTEMPTS)
+    if best is None:
+        # Ni la calidad máxima probada alcanza el objetivo: se usa la calidad máxima
+        best = (MAX_QUALITY, probe(MAX_QUALITY))
+    quality, score = best
+    return encoded[quality], (quality, params['resize_factor'], len(encoded[quality]) / 1024, score)
+
+def _save_compressed(img, output, params, fallback_format=None):
+    """
+    Convierte, redimensiona y guarda una imagen ya abierta.
+
+    :param img: Imagen abierta con PIL.
+    :param output: Ruta o archivo en memoria donde guardar la imagen.
+    :param params: Parámetros de compresión (ver `compression_params`).
+    :param fallback_format: Formato a usar cuando no es uno de los de salida y no se puede deducir de la ruta.
+    :return: Configuración encontrada en los modos de peso máximo o de calidad perceptual, o None.
+    """
+    output_format = params['output_format']
+    resize_factor = params['resize_factor']
+    convert_to_grayscale = params['convert_to_grayscale']
+    original_format = img.format if output_format is None else output_format
+
+    # Modos de peso máximo y de calidad perceptual: buscar la configuración por imagen y escribir la mejor codificación
+    data = None
+    if params['max_kb'] or params['target_ssim']:
+        if get_encoder(original_format) is not None:
+            image_format = original_format
+        elif fallback_format is None and isinstance(output, str):
+            image_format = encoder_for_path(output).name
+        else:
+            image_format = fallback_format
+        if params['max_kb']:
+            data, best = _search_target_size(_convert_for_format(img, original_format, convert_to_grayscale), image_format, params)
+        elif get_encoder(image_format).has_quality(params):
+            # Los formatos sin calidad que ajustar se guardan como en el modo normal
+            data, best = _search_target_ssim(img, original_format, image_format, params)
+    if data is not None:
+        if isinstance(output, str):
+            with open(output, 'wb') as f:
+                f.write(data)
+        else:
+            output.write(data)
+        return best
+
+    # Decodificar JPEG a escala reducida cuando el redimensionado lo permite
+    target_size = scaled_size(img.size, resize_factor)
+    if resize_factor < 1.0:
+        draft_for_size(img, target_size, convert_to_grayscale)
+
+    # Convertir imagen si es necesario
+    img = _convert_for_format(img, original_format, convert_to_grayscale)
+
+    # Redimensionar imagen
+    if img.size != target_size:
+        img = resize_image(img, target_size, params['resize_strategy'])
+
+    # Guardar imagen comprimida con el codificador registrado del formato
+    encoder = get_encoder(original_format)
+    if encoder is not None:
+        encoder.save(img, output, encoder.options(params['quality'], params))
+    else:
+        img.save(output, fallback_format, optimize=True)
+    return None
+
+def _encode_best_format(img, params):
+    """
+    Codifica una imagen en todos los formatos candidatos en paralelo y elige la salida más pequeña.
+
+    Solo se eligen los candidatos cuya fidelidad respecto a la imagen redimensionada alcanza
+    `min_psnr`; si ninguno la alcanza, se elige el más fiel.
+
+    :param img: Imagen abierta con PIL.
+    :param params: Parámetros de compresión con `best_formats`.
+    :return: Tupla (bytes del formato elegido, elección); la elección es un diccionario con el
+             formato elegido, si alcanzó la fidelidad mínima y, por formato, el tamaño en bytes y el PSNR.
+    """
+    resize_factor = params['resize_factor']
+    convert_to_grayscale = params['convert_to_grayscale']
+    target_size = scaled_size(img.size, resize_factor)
+    if resize_factor < 1.0:
+        draft_for_size(img, target_size, convert_to_grayscale)
+
+    # Una sola conversión y un solo redimensionado para todos los candidatos
+    if convert_to_grayscale:
+        img = img.convert('L')
+    elif img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+    if img.size != target_size:
+        img = resize_image(img, target_size, params['resize_strategy'])
+    img.load()
+
+    def encode(image_format):
+        encoder = get_encoder(image_format)
+        data = encode_to_bytes(encoder.convert(img), image_format, **encoder.options(params['quality'], params))
+        return image_format, data, psnr(img, data)
+
+    # Los codificadores de PIL liberan el GIL, así que los candidatos se codifican en hilos
+    formats = params['best_formats']
+    with ThreadPoolExecutor(len(formats)) as pool:
+        candidates = list(pool.map(encode, formats))
+
+    accepted = [candidate for candidate in candidates if candidate[2] >= params['min_psnr']]
+    if accepted:
+        image_format, data, _ = min(accepted, key=lambda candidate: len(candidate[1]))
+    else:
+        image_format, data, _ = max(candidates, key=lambda candidate: candidate[2])
+    return data, {'format': image_format, 'accepted': bool(accepted),
+                  'candidates': {name: (len(encoded), fidelity) for name, encoded, fidelity in candidates}}
+
+def _best_output_path(output_path, choice):
+    """Ruta de salida con la extensión del formato elegido en el modo de mejor formato."""
+    return os.path.splitext(output_path)[0] + get_encoder(choice['format']).extension
+
+def _describe_choice(output_path, choice):
+    """Mensaje de éxito del modo de mejor formato, con el tamaño y la fidelidad de cada candidato."""
+    details = ", ".join(f"{name} {size / 1024:.1f} KB / {fidelity:.1f} dB"
+                        for name, (size, fidelity) in sorted(choice['candidates'].items(), key=lambda item: item[1][0]))
+    warning = "" if choice['accepted'] else "; ningún formato alcanzó la fidelidad mínima"
+    return f"Imagen comprimida y guardada: {output_path} ({choice['format']}; {details}{warning})"
+
+def _describe_result(output_path, best):
+    """Mensaje de éxito, con la configuración encontrada en los modos de peso máximo o de calidad perceptual."""
+    if best is None:
+        return f"Imagen comprimida y guardada: {output_path}"
+    quality, resize_factor, size_kb = best[:3]
+    score = f", SSIM {best[3]:.4f}" if len(best) > 3 else ""
+    return f"Imagen comprimida y guardada: {output_path} (calidad {quality}, factor {resize_factor}, {size_kb:.1f} KB{score})"
+
+def _cache_key(cache, content_hash, output_path, params):
+    """Calcula la clave de la caché de contenido para una imagen y sus parámetros."""
+    return cache.key(content_hash, params_hash(params), os.path.splitext(output_path)[1])
+
+def _unlink_output(output_path):
+    """Elimina una salida previa para no escribir sobre un enlace duro compartido con la caché por contenido."""
+    if os.path.lexists(output_path):
+        os.remove(output_path)
+
+def _write_output(output_path, data):
+    """Escribe una imagen comprimida en memoria en su ruta de salida."""
+    _unlink_output(output_path)
+    with open(output_path, 'wb') as f:
+        f.write(data)
+
+def _compress_file(input_path, output_path, params, cache=None):
+    """
+    Tarea de los backends de hilos y procesos: comprime un archivo con los parámetros indicados.
+
+    :return: Tupla (estado, elección); el estado es STATUS_OK, STATUS_ERROR o STATUS_UNREACHABLE
+             (no cabe en el peso máximo) y la elección, la del modo de mejor formato (o None).
     """
     try:
+        if params['best_formats']:
+            with Image.open(input_path) as img:
+                data, choice = _encode_best_format(img, params)
+            choice['output'] = _best_output_path(output_path, choice)
+            _write_output(choice['output'], data)
+            print(_describe_choice(choice['output'], choice))
+            return STATUS_OK, choice
+        if cache is not None:
+            cache_key = _cache_key(cache, hash_file(input_path), output_path, params)
+            if cache.fetch(cache_key, output_path):
+                print(f"Imagen duplicada reutilizada desde la caché: {output_path}")
+                return STATUS_OK, None
+        _unlink_output(output_path)
         with Image.open(input_path) as img:
-            original_format = img.format if output_format is None else output_format
-            
-            # Convertir imagen si es necesario
-            if convert_to_grayscale:
-                img = img.convert('L')
-            else:
-                if original_format == 'JPEG':
-                    if img.mode in ('RGBA', 'LA'):
-                        img = img.convert('RGB')
-                elif original_format == 'PNG':
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                else:
-                    img = img.convert('RGB')
-
-            # Redimensionar imagen
-            if resize_factor != 1.0:
-                width, height = img.size
-                img = img.resize((int(width * resize_factor), int(height * resize_factor)), Image.Resampling.LANCZOS)
-
-            # Guardar imagen comprimida
-            if original_format == 'JPEG':
-                img.save(output_path, original_format, quality=quality, optimize=True)
-            elif original_format == 'PNG':
-                img.save(output_path, original_format, optimize=True)
-            else:
-                img.save(output_path, optimize=True)
+            best = _save_compressed(img, output_path, params)
+        if cache is not None:
+            cache.store(cache_key, output_path)
+        print(_describe_result(output_path, best))
+        return STATUS_OK, None
+    except TargetSizeNotReached as e:
+        print(f"La imagen {input_path} {e}.")
+        return STATUS_UNREACHABLE, None
+    except Exception as e:
+        print(f"Error al comprimir la imagen {input_path}: {e}")
+        return STATUS_ERROR, None
+
+def compress_image(input_path, output_path, quality=85, output_format=None, resize_factor=1.0, convert_to_grayscale=False,
+                   cache=None, resize_strategy=DEFAULT_RESIZE_STRATEGY, webp_method=DEFAULT_WEBP_METHOD, lossless=False):
+    """
+    Comprime una imagen para reducir su tamaño manteniendo la calidad.
+
+    :param cache: ContentCache opcional para reutilizar la salida de entradas idénticas.
+    :param resize_strategy: Estrategia de redimensionado ('quality', 'balanced' o 'fast').
+    :param webp_method: Esfuerzo del codificador WebP (0-6).
+    :param lossless: Si es True, WebP se codifica sin pérdida.
+    :return: Booleano que indica si la imagen se comprimió correctamente.
+    """
+    params = compression_params(quality, output_format, resize_factor, convert_to_grayscale, resize_strategy,
+                                webp_method=webp_method, lossless=lossless)
+    return _compress_file(input_path, output_path, params, cache)[0] == STATUS_OK
 
-            print(f"Imagen comprimida y guardada: {output_path}")
+def compress_image_data(data, output_path, params):
+    """
+    Etapa de CPU del backend híbrido: comprime los bytes de una imagen en memoria.
+
+    :param data: Contenido del archivo de origen.
+    :param output_path: Ruta de destino, usada solo para deducir el formato de salida.
+    :param params: Parámetros de compresión (ver `compression_params`).
+    :return: Tupla (bytes de la imagen comprimida, configuración encontrada en el modo de peso máximo,
+             elección del modo de mejor formato o None).
+    """
+    if params['best_formats']:
+        with Image.open(io.BytesIO(data)) as img:
+            return _encode_best_format(img, params)
+    fallback_format = encoder_for_path(output_path).name
+    buffer = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as img:
+        best = _save_compressed(img, buffer, params, fallback_format)
+    return buffer.getvalue(), best
+
+def _compress_image_hybrid(cpu_pool, input_path, output_path, params, cache=None):
+    """
+    Etapa de E/S del backend híbrido: lee el origen, delega la compresión al pool de procesos y escribe el resultado.
+
+    :return: Tupla (estado, elección) como la de `_compress_file`.
+    """
+    try:
+        with open(input_path, 'rb') as f:
+            data = f.read()
+        if params['best_formats']:
+            compressed, choice = cpu_pool.submit(compress_image_data, data, output_path, params).result()
+            choice['output'] = _best_output_path(output_path, choice)
+            _write_output(choice['output'], compressed)
+            print(_describe_choice(choice['output'], choice))
+            return STATUS_OK, choice
+        if cache is not None:
+            cache_key = _cache_key(cache, hash_bytes(data), output_path, params)
+            if cache.fetch(cache_key, output_path):
+                print(f"Imagen duplicada reutilizada desde la caché: {output_path}")
+                return STATUS_OK, None
+        compressed, best = cpu_pool.submit(compress_image_data, data, output_path, params).result()
+        _write_output(output_path, compressed)
+        if cache is not None:
+            cache.store(cache_key, output_path)
+        print(_describe_result(output_path, best))
+        return STATUS_OK, None
+    except TargetSizeNotReached as e:
+        print(f"La imagen {input_path} {e}.")
+        return STATUS_UNREACHABLE, None
     except Exception as e:
         print(f"Error al comprimir la imagen {input_path}: {e}")
+        return STATUS_ERROR, None
 
-def compress_images_in_folder(folder_path, output_folder, quality=85, output_format=None, resize_factor=1.0, convert_to_grayscale=False):
+def compress_images_in_folder(folder_path, output_folder, quality=85, output_format=None, resize_factor=1.0, convert_to_grayscale=False,
+                              backend=None, workers=None, recursive=False, include=None, exclude=None, max_in_flight=None,
+                              memory_budget=None, incremental=False, content_cache=None, content_cache_size=DEFAULT_CONTENT_CACHE_SIZE,
+                              resize_strategy=DEFAULT_RESIZE_STRATEGY, max_kb=None, files=None, on_result=None,
+                              webp_method=DEFAULT_WEBP_METHOD, lossless=False, best_formats=None, min_psnr=DEFAULT_MIN_PSNR,
+                              target_ssim=None):
     """
     Comprime todas las imágenes en una carpeta utilizando compresión en paralelo.
+
+    Los archivos se descubren de forma perezosa y solo se mantiene en vuelo un número
+    acotado de tareas, de modo que la memoria no crece con el tamaño de la carpeta.
+
+    :param backend: Backend de ejecución ('threads', 'processes' o 'hybrid'); por defecto según los núcleos.
+    :param workers: Número de trabajadores; por defecto según los núcleos y el backend.
+    :param recursive: Si es True, procesa también las subcarpetas y replica su estructura en la salida.
+    :param include: Patrones glob que deben cumplir los archivos a procesar.
+    :param exclude: Patrones glob de archivos o carpetas a omitir.
+    :param max_in_flight: Máximo de tareas en vuelo; por defecto un múltiplo pequeño de los trabajadores.
+    :param memory_budget: Presupuesto en bytes para la suma de imágenes decodificadas en vuelo (None para no limitar).
+    :param incremental: Si es True, omite las imágenes sin cambios según el manifiesto de la carpeta de salida.
+    :param content_cache: Carpeta de la caché por contenido para reutilizar la salida de imágenes idénticas (None para desactivarla).
+    :param content_cache_size: Tamaño máximo en bytes de la caché por contenido.
+    :param resize_strategy: Estrategia de redimensionado ('quality', 'balanced' o 'fast').
+    :param max_kb: Peso máximo por imagen en KB; activa la búsqueda de calidad y factor por imagen.
+    :param files: Archivos de `folder_path` a procesar en lugar de recorrer la carpeta (por ejemplo, una selección).
+    :param on_result: Función llamada con (archivo, estado) al terminar cada imagen; si lanza una
+                      excepción, se dejan de enviar imágenes y la excepción se propaga.
+    :param webp_method: Esfuerzo del codificador WebP (0 rápido - 6 archivos más pequeños).
+    :param lossless: Si es True, WebP se codifica sin pérdida.
+    :param best_formats: Formatos candidatos (por ejemplo DEFAULT_BEST_FORMATS); si se indican, cada imagen
+                         se codifica en todos ellos y se guarda el más pequeño que alcanza `min_psnr`,
+                         ignorando `output_format`. Al final se informa del resultado por formato.
+    :param min_psnr: Fidelidad mínima (PSNR en dB) de un candidato del modo de mejor formato.
+    :param target_ssim: SSIM objetivo (por ejemplo DEFAULT_TARGET_SSIM); activa la búsqueda por imagen de la
+                        calidad más baja que lo alcanza, medido sobre la luminancia. Necesita NumPy.
     """
-    supported_formats = ('.jpg', '.jpeg', '.png')
     if not validate_folder_path(folder_path):
         print(f"La carpeta de origen no existe: {folder_path}")
         return
+    if best_formats:
+        unknown = [name for name in best_formats if get_encoder(name) is None]
+        if unknown:
+            print(f"Formatos no registrados: {', '.join(unknown)}.")
+            return
+        if max_kb:
+            print("El modo de mejor formato no se puede combinar con el peso máximo.")
+            return
+        if content_cache:
+            # La extensión de la salida depende del formato elegido, que solo se conoce al codificar
+            print("La caché por contenido no se usa en el modo de mejor formato.")
+            content_cache = None
+    if target_ssim:
+        if max_kb or best_formats:
+            print("El modo de calidad perceptual no se puede combinar con el peso máximo ni con el modo de mejor formato.")
+            return
+        try:
+            require_numpy()
+        except RuntimeError as e:
+            print(e)
+            return
 
     os.makedirs(output_folder, exist_ok=True)
 
-    # Recopilar archivos de imagen
-    image_files = [os.path.join(folder_path, filename)
-                   for filename in os.listdir(folder_path)
-                   if filename.lower().endswith(supported_formats)]
+    backend = backend or default_backend()
+    workers = workers or default_workers(backend)
+    max_in_flight = max_in_flight or default_max_in_flight(workers)
+
+    # Recorrer archivos de imagen de forma perezosa
+    if files is not None:
+        image_files = iter(files)
+    else:
+        image_files = iter_image_files(folder_path, SUPPORTED_FORMATS, recursive, include, exclude, skip_dirs=[output_folder])
 
     # Función para determinar el formato de salida
     def get_output_file(input_file):
-        ext = output_format.lower() if output_format else os.path.splitext(input_file)[1].lower()
-        if ext not in supported_formats:
-            ext = '.jpg' if output_format == 'JPEG' else '.png'
-        return os.path.join(output_folder, os.path.splitext(os.path.basename(input_file))[0] + ext)
-
-    # Ejecutar compresión en paralelo
-    with ThreadPoolExecutor() as executor:
-        futures = [executor.submit(compress_image, file, get_output_file(file), quality, output_format, resize_factor, convert_to_grayscale)
-                   for file in image_files]
-        for future in as_completed(futures):
-            future.result()
+        ext = get_encoder(output_format).extension if output_format else os.path.splitext(input_file)[1].lower()
+        if ext not in SUPPORTED_FORMATS:
+            ext = '.png'
+        rel_path = os.path.relpath(input_file, folder_path)
+        output_file = os.path.join(output_folder, os.path.splitext(rel_path)[0] + ext)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        return output_file
+
+    # Manifiesto para omitir imágenes sin cambios en modo incremental
+    manifest = BatchManifest(output_folder) if incremental else None
+    params = compression_params(quality, output_format, resize_factor, convert_to_grayscale, resize_strategy, max_kb,
+                                webp_method, lossless, best_formats, min_psnr, target_ssim)
+    params_key = params_hash(params)
+    cache = ContentCache(content_cache, content_cache_size) if content_cache else None
+    signatures = {}
+    skipped = 0
+    unreachable = []
+    # Modo de mejor formato, por formato: [imágenes elegidas, bytes elegidos, bytes como candidato, candidatos bajo el umbral]
+    format_report = {name: [0, 0, 0, 0] for name in best_formats or ()}
+
+    # Generar las tareas de forma perezosa a partir del recorrido
+    def iter_tasks(executor):
+        nonlocal skipped
+        for file in image_files:
+            output_file = get_output_file(file)
+            if manifest is not None:
+                source = os.path.relpath(file, folder_path)
+                signature = file_signature(file)
+                expected_output = manifest.output_for(source) if best_formats else output_file
+                if manifest.is_current(source, signature, params_key, expected_output):
+                    skipped += 1
+                    continue
+                signatures[file] = signature
+            if isinstance(executor, HybridExecutor):
+                yield file, _compress_image_hybrid, (executor.cpu_pool, file, output_file, params, cache)
+            else:
+                yield file, _compress_file, (file, output_file, params, cache)
+
+    # Ejecutar compresión en paralelo con una ventana acotada de tareas en vuelo
+    try:
+        with create_executor(backend, workers) as executor:
+            for file, (status, choice) in run_bounded(executor, iter_tasks(executor), max_in_flight, memory_budget, estimate_decoded_bytes):
+                signature = signatures.pop(file, None)
+                if status == STATUS_UNREACHABLE:
+                    unreachable.append(file)
+                if choice is not None:
+                    for name, (size, fidelity) in choice['candidates'].items():
+                        format_report[name][2] += size
+                        format_report[name][3] += fidelity < min_psnr
+                    format_report[choice['format']][0] += 1
+                    format_report[choice['format']][1] += choice['candidates'][choice['format']][0]
+                if cache is not None and status == STATUS_OK:
+                    # Los trabajadores guardan en copias de la caché: la purga periódica se hace aquí
+                    cache.note_stores()
+                if manifest is not None and status == STATUS_OK:
+                    output_file = choice['output'] if choice is not None else get_output_file(file)
+                    manifest.record(os.path.relpath(file, folder_path), signature, params_key, output_file)
+                if on_result is not None:
+                    on_result(file, status)
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if cache is not None:
+            cache.evict()
 
+    if skipped:
+        print(f"\nOmitidas {skipped} imágenes sin cambios desde la última ejecución.")
+    if any(report[2] for report in format_report.values()):
+        print(f"\nFormato elegido por imagen (fidelidad mínima {min_psnr} dB):")
+        for name, (chosen, chosen_bytes, candidate_bytes, rejected) in format_report.items():
+            print(f"  {name}: elegido en {chosen} imágenes ({chosen_bytes / 1024:.1f} KB); "
+                  f"{candidate_bytes / 1024:.1f} KB como candidato en todas; {rejected} bajo la fidelidad mínima")
+    if unreachable:
+        print(f"\n{len(unreachable)} imágenes no alcanzaron el peso máximo de {max_kb} KB:")
+        for file in sorted(unreachable):
+            print(f"  {file}")
     print(f"\nCompresión completada. Imágenes guardadas en: {output_folder}")
 
+def _generate_thumbnails(input_path, store, sizes):
+    """
+    Genera en el almacén las miniaturas de una imagen. Se ejecuta en los trabajadores.
+
+    :return: Número de miniaturas generadas, o None si hubo un error.
+    """
+    try:
+        return store.ensure(input_path, sizes)
+    except Exception as e:
+        print(f"Error al generar las miniaturas de {input_path}: {e}")
+        return None
+
+def generate_thumbnails(folder_path, store_dir=DEFAULT_STORE_DIR, sizes=DEFAULT_THUMBNAIL_SIZES, store_size=DEFAULT_STORE_SIZE,
+                        backend=None, workers=None, recursive=False, include=None, exclude=None, max_in_flight=None):
+    """
+    Genera en el almacén persistente las miniaturas de todas las imágenes de una carpeta.
+
+    El almacén es el mismo que usa la interfaz gráfica, de modo que las carpetas preparadas
+    aquí se abren allí sin decodificar las imágenes. Las imágenes cuyo contenido ya tiene
+    miniaturas se omiten.
+
+    :param store_dir: Carpeta del almacén de miniaturas.
+    :param sizes: Tamaños (ancho, alto) de miniatura a generar.
+    :param store_size: Tamaño máximo en bytes del almacén; se eliminan las entradas menos usadas.
+    """
+    if not validate_folder_path(folder_path):
+        print(f"La carpeta de origen no existe: {folder_path}")
+        return
+
+    backend = backend or default_backend()
+    workers = workers or default_workers(backend)
+    max_in_flight = max_in_flight or default_max_in_flight(workers)
+    store = ThumbnailStore(store_dir, store_size)
+    image_files = iter_image_files(folder_path, SUPPORTED_FORMATS, recursive, include, exclude, skip_dirs=[store_dir])
+    created = reused = failed = 0
+
+    try:
+        with create_executor(backend, workers) as executor:
+            # Generar miniaturas es trabajo de CPU: en el backend híbrido va directo a los procesos
+            pool = executor.cpu_pool if isinstance(executor, HybridExecutor) else executor
+            tasks = ((file, _generate_thumbnails, (file, store, sizes)) for file in image_files)
+            for file, count in run_bounded(pool, tasks, max_in_flight):
+                if count is None:
+                    failed += 1
+                elif count:
+                    created += 1
+                else:
+                    reused += 1
+    finally:
+        store.evict()
+
+    print(f"\nMiniaturas generadas para {created} imágenes; {reused} ya estaban en el almacén"
+          + (f"; {failed} con errores." if failed else "."))
+    print(f"Almacén de miniaturas: {store_dir}")
+
 def validate_output_path(output_folder):
     """
     Valida si la ruta de salida es una carpeta válida para guardar las imágenes en Windows.
@@ -107,13 +615,100 @@ def validate_output_path(output_folder):
     print(f"La ruta de salida debe estar en una de las carpetas permitidas: {', '.join(allowed_paths)}.")
     return False
 
+def parse_arguments():
+    """
+    Analiza las opciones de línea de comandos del motor de compresión por lotes.
+
+    :return: Namespace con las opciones indicadas.
+    """
+    parser = argparse.ArgumentParser(description="Compresor de imágenes por lotes.")
+    parser.add_argument('--backend', choices=BACKENDS, default=None,
+                        help="Backend de ejecución: hilos, procesos o híbrido (por defecto según los núcleos).")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Número de trabajadores (por defecto según los núcleos).")
+    parser.add_argument('--recursive', action='store_true',
+                        help="Procesa también las subcarpetas, replicando su estructura en la salida.")
+    parser.add_argument('--include', action='append', default=None, metavar='GLOB',
+                        help="Procesa solo los archivos que coincidan con el patrón (repetible).")
+    parser.add_argument('--exclude', action='append', default=None, metavar='GLOB',
+                        help="Omite archivos o carpetas que coincidan con el patrón (repetible).")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="Máximo de imágenes en proceso a la vez (por defecto el doble de trabajadores).")
+    parser.add_argument('--memory-budget', type=int, default=None, metavar='MB',
+                        help="Memoria máxima (MB) estimada para las imágenes decodificadas en vuelo.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Omite las imágenes que no cambiaron desde la última ejecución con los mismos parámetros.")
+    parser.add_argument('--content-cache', default=None, metavar='DIR',
+                        help="Carpeta de caché por contenido para reutilizar la salida de imágenes idénticas.")
+    parser.add_argument('--content-cache-size', type=int, default=DEFAULT_CONTENT_CACHE_SIZE // (1024 * 1024), metavar='MB',
+                        help="Tamaño máximo (MB) de la caché por contenido; se eliminan las entradas menos usadas.")
+    parser.add_argument('--resize-strategy', choices=list(RESIZE_STRATEGIES), default=DEFAULT_RESIZE_STRATEGY,
+                        help="Compromiso calidad/velocidad del redimensionado: 'quality' (LANCZOS directo), "
+                             "'balanced' o 'fast' (reducción entera previa más LANCZOS).")
+    parser.add_argument('--max-kb', type=float, default=None,
+                        help="Peso máximo por imagen en KB: busca la calidad y el factor de reducción de cada imagen "
+                             "e informa de las que no lo alcanzan (ignora la calidad y el factor indicados).")
+    parser.add_argument('--webp-method', type=int, choices=WEBP_METHODS, default=DEFAULT_WEBP_METHOD, metavar='0-6',
+                        help="Esfuerzo del codificador WebP: 0 es el más rápido y 6 genera los archivos más pequeños.")
+    parser.add_argument('--lossless', action='store_true',
+                        help="Codifica WebP sin pérdida (la calidad se ignora).")
+    parser.add_argument('--best-format', nargs='*', choices=output_formats(), default=None, metavar='FORMAT',
+                        help="Codifica cada imagen en varios formatos en paralelo y guarda el más pequeño que alcanza la "
+                             f"fidelidad mínima (sin formatos: {', '.join(DEFAULT_BEST_FORMATS)}; ignora el formato de salida).")
+    parser.add_argument('--min-psnr', type=float, default=DEFAULT_MIN_PSNR, metavar='DB',
+                        help="Fidelidad mínima (PSNR en dB) de los candidatos del modo de mejor formato.")
+    parser.add_argument('--target-ssim', nargs='?', type=float, const=DEFAULT_TARGET_SSIM, default=None, metavar='SSIM',
+                        help="Busca por imagen la calidad más baja cuyo SSIM sobre la luminancia alcanza el objetivo "
+                             f"(por defecto {DEFAULT_TARGET_SSIM}; ignora la calidad indicada). Necesita NumPy.")
+    parser.add_argument('--generate-thumbnails', action='store_true',
+                        help="En lugar de comprimir, genera las miniaturas de la carpeta en el almacén compartido con la interfaz gráfica.")
+    parser.add_argument('--thumbnail-store', default=DEFAULT_STORE_DIR, metavar='DIR',
+                        help="Carpeta del almacén persistente de miniaturas.")
+    parser.add_argument('--thumbnail-size', action='append', type=int, default=None, metavar='PX',
+                        help="Lado máximo de las miniaturas a generar (repetible; por defecto los tamaños de la interfaz gráfica).")
+    parser.add_argument('--thumbnail-store-size', type=int, default=DEFAULT_STORE_SIZE // (1024 * 1024), metavar='MB',
+                        help="Tamaño máximo (MB) del almacén de miniaturas; se eliminan las menos usadas.")
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers debe ser un entero positivo.")
+    if args.max_in_flight is not None and args.max_in_flight < 1:
+        parser.error("--max-in-flight debe ser un entero positivo.")
+    if args.memory_budget is not None and args.memory_budget < 1:
+        parser.error("--memory-budget debe ser un entero positivo.")
+    if args.max_kb is not None and args.max_kb <= 0:
+        parser.error("--max-kb debe ser un número positivo.")
+    if args.best_format is not None and args.max_kb is not None:
+        parser.error("--best-format no se puede combinar con --max-kb.")
+    if args.target_ssim is not None:
+        if not 0 < args.target_ssim < 1:
+            parser.error("--target-ssim debe estar entre 0 y 1.")
+        if args.max_kb is not None or args.best_format is not None:
+            parser.error("--target-ssim no se puede combinar con --max-kb ni con --best-format.")
+    if args.thumbnail_size and min(args.thumbnail_size) < 1:
+        parser.error("--thumbnail-size debe ser un entero positivo.")
+    return args
+
 if __name__ == "__main__":
+    args = parse_arguments()
     print("=== Compresor de Imágenes ===\n")
 
+    if args.generate_thumbnails:
+        folder_path = get_validated_input("Introduce la ruta de la carpeta con las imágenes (o 'q' para salir): ", validate_func=validate_folder_path)
+        sizes = [(size, size) for size in args.thumbnail_size] if args.thumbnail_size else DEFAULT_THUMBNAIL_SIZES
+        generate_thumbnails(folder_path, args.thumbnail_store, sizes, args.thumbnail_store_size * 1024 * 1024,
+                            backend=args.backend, workers=args.workers,
+                            recursive=args.recursive, include=args.include, exclude=args.exclude,
+                            max_in_flight=args.max_in_flight)
+        exit()
+
     folder_path = get_validated_input("Introduce la ruta de la carpeta con las imágenes a comprimir (o 'q' para salir): ", validate_func=validate_folder_path)
     output_folder = get_validated_input("Introduce la ruta de la carpeta de salida para las imágenes comprimidas (o 'q' para salir): ", validate_func=validate_output_path)
     quality_input = get_validated_input("Introduce el nivel de calidad para la compresión (1-100, por defecto es 85, 'q' para salir): ", validate_func=validate_quality, default="85")
-    format_input = get_validated_input("Introduce el formato de salida (JPEG, PNG, mantener original - dejar en blanco, 'q' para salir): ", valid_options=["jpeg", "png", ""], default="")
+    if args.best_format is None:
+        format_input = get_validated_input(f"Introduce el formato de salida ({', '.join(output_formats())}, mantener original - dejar en blanco, 'q' para salir): ",
+                                           valid_options=[name.lower() for name in output_formats()] + [""], default="")
+    else:
+        format_input = ""  # El modo de mejor formato elige el formato de cada imagen
     resize_input = get_validated_input("Introduce el factor de reducción de resolución (por defecto es 1.0, sin cambio): ", default="1.0")
     grayscale_option = get_validated_input("¿Convertir a escala de grises? (s/n, por defecto es 'n'): ", valid_options=["s", "n"], default="n")
 
@@ -122,4 +717,14 @@ if __name__ == "__main__":
     resize_factor = float(resize_input) if resize_input else 1.0
     convert_to_grayscale = grayscale_option == 's'
 
-    compress_images_in_folder(folder_path, output_folder, quality, output_format, resize_factor, convert_to_grayscale)
\ No newline at end of file
+    compress_images_in_folder(folder_path, output_folder, quality, output_format, resize_factor, convert_to_grayscale,
+                              backend=args.backend, workers=args.workers,
+                              recursive=args.recursive, include=args.include, exclude=args.exclude,
+                              max_in_flight=args.max_in_flight,
+                              memory_budget=args.memory_budget * 1024 * 1024 if args.memory_budget else None,
+                              incremental=args.incremental,
+                              content_cache=args.content_cache, content_cache_size=args.content_cache_size * 1024 * 1024,
+                              resize_strategy=args.resize_strategy, max_kb=args.max_kb,
+                              webp_method=args.webp_method, lossless=args.lossless,
+                              best_formats=(args.best_format or DEFAULT_BEST_FORMATS) if args.best_format is not None else None,
+                              min_psnr=args.min_psnr, target_ssim=args.target_ssim)